@@ -1,8 +1,365 @@
-from flask import Flask, request, jsonify
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from configparser import ConfigParser
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from urllib3.util.retry import Retry
+
+import metrics
+
+from backend_pool import BackendPool, model_tag
+from context_window import ContextWindow, message_tokens
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache
+from model_catalog import ModelCatalog
+from response_cache import ResponseCache, is_deterministic, replay, response_key
+from scheduler import QueueFull, Scheduler
+from session_context import SessionContexts
+from session_store import SessionStore
+from single_flight import SingleFlight
+
+# Load configurations
+config = ConfigParser()
+config.read('config.ini')
+
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', config.get('ollama', 'host', fallback='http://localhost:11434')).rstrip('/')
+BACKENDS = [url.strip() for url in config.get('gateway', 'backends', fallback='').split('\n') if url.strip()] or [OLLAMA_HOST]
+HEALTH_INTERVAL = config.getfloat('gateway', 'health_interval', fallback=10.0)
+POOL_SIZE = config.getint('gateway', 'pool_size', fallback=32)
+CONNECT_TIMEOUT = config.getfloat('gateway', 'connect_timeout', fallback=5.0)
+READ_TIMEOUT = config.getfloat('gateway', 'read_timeout', fallback=600.0)
+CONNECT_RETRIES = config.getint('gateway', 'connect_retries', fallback=3)
+RETRY_BACKOFF = config.getfloat('gateway', 'retry_backoff', fallback=0.5)
+EMBED_BATCH_WINDOW_MS = config.getfloat('gateway', 'embed_batch_window_ms', fallback=10.0)
+EMBED_MAX_BATCH = config.getint('gateway', 'embed_max_batch', fallback=64)
+EMBED_CONCURRENCY = config.getint('gateway', 'embed_concurrency', fallback=4)
+EMBED_CACHE_FILE = config.get('embedding_cache', 'file', fallback='embedding_cache.db')
+EMBED_CACHE_MEMORY_ITEMS = config.getint('embedding_cache', 'memory_items', fallback=10000)
+EMBED_CACHE_MAX_MB = config.getint('embedding_cache', 'max_mb', fallback=1024)
+RESPONSE_CACHE_ENABLED = config.getboolean('response_cache', 'enabled', fallback=False)
+RESPONSE_CACHE_MAX_ENTRIES = config.getint('response_cache', 'max_entries', fallback=1000)
+RESPONSE_CACHE_TTL = config.getfloat('response_cache', 'ttl', fallback=3600.0)
+BLOB_SPOOL_DIR = config.get('gateway', 'blob_spool_dir', fallback='blob_uploads')
+BLOB_CHUNK_SIZE = config.getint('gateway', 'blob_chunk_size', fallback=1024 * 1024)
+CATALOG_TTL = config.getfloat('gateway', 'catalog_ttl', fallback=60.0)
+CATALOG_REFRESH_INTERVAL = config.getfloat('gateway', 'catalog_refresh_interval', fallback=15.0)
+SINGLE_FLIGHT = config.getboolean('gateway', 'single_flight', fallback=True)
+SESSION_CONTEXTS = config.getint('gateway', 'session_contexts', fallback=1000)
+SESSION_CONTEXT_TTL = config.getfloat('gateway', 'session_context_ttl', fallback=3600.0)
+SESSIONS_FILE = config.get('sessions', 'file', fallback='sessions.db')
+SESSION_MAX_MESSAGES = config.getint('sessions', 'max_messages', fallback=200)
+SESSION_MEMORY = config.getint('sessions', 'memory_sessions', fallback=1000)
+SESSION_TTL = config.getfloat('sessions', 'ttl', fallback=7 * 86400.0)
+SESSION_MAX_TOKENS = config.getint('sessions', 'max_tokens', fallback=8192)
+MAX_CONCURRENCY = config.getint('scheduler', 'max_concurrency', fallback=4 * len(BACKENDS))
+MODEL_CONCURRENCY = config.getint('scheduler', 'model_concurrency', fallback=2 * len(BACKENDS))
+MODEL_LIMITS = {name: int(limit) for name, limit in config.items('model_limits')} if config.has_section('model_limits') else {}
+MAX_QUEUE = config.getint('scheduler', 'max_queue', fallback=100)
+GROUP_WAIT = config.getfloat('scheduler', 'group_wait', fallback=2.0)
+QUEUE_TIMEOUT = config.getfloat('scheduler', 'queue_timeout', fallback=300.0)
 
 app = Flask(__name__)
 
+# One urllib3 pool shared by every worker thread; connections are kept alive
+# and reused. Only connection failures are retried, since at that point the
+# request has not reached Ollama yet.
+adapter = HTTPAdapter(
+    pool_connections=max(4, len(BACKENDS)),
+    pool_maxsize=POOL_SIZE,
+    pool_block=True,
+    max_retries=Retry(total=CONNECT_RETRIES, connect=CONNECT_RETRIES, read=0, redirect=0, status=0,
+                      backoff_factor=RETRY_BACKOFF),
+)
+local = threading.local()
+
+def session():
+    """Return this thread's Session, mounted on the shared connection pool."""
+    if not hasattr(local, 'session'):
+        local.session = requests.Session()
+        local.session.mount('http://', adapter)
+        local.session.mount('https://', adapter)
+    return local.session
+
+def upstream(method, path, model=None, **kwargs):
+    """Send a request to an Ollama backend using the shared pool.
+
+    Backends are tried in the order chosen by the backend pool, moving on to
+    the next one when a host cannot be reached. Streamed responses count
+    against their backend until release_upstream() is called.
+    """
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    error = None
+    for backend in backends.candidates(model):
+        backends.acquire(backend)
+        try:
+            response = session().request(method, f'{backend.url}/api/{path}', **kwargs)
+        except requests.ConnectionError as e:
+            backends.release(backend)
+            backends.mark_failed(backend)
+            error = e
+            continue
+        response.backend, response.model = backend, model
+        if not kwargs.get('stream'):
+            release_upstream(response)
+        return response
+    raise error
+
+def release_upstream(response):
+    backend = getattr(response, 'backend', None)
+    if backend is not None:
+        response.backend = None
+        backends.release(backend, response.model if response.ok else None)
+
+def probe_backend(url):
+    """Return the (loaded, available) model names of one backend."""
+    timeout = (CONNECT_TIMEOUT, CONNECT_TIMEOUT)
+    ps = session().get(f'{url}/api/ps', timeout=timeout)
+    ps.raise_for_status()
+    tags = session().get(f'{url}/api/tags', timeout=timeout)
+    tags.raise_for_status()
+    return ([model['name'] for model in ps.json().get('models', [])],
+            [model['name'] for model in tags.json().get('models', [])])
+
+backends = BackendPool(BACKENDS, probe_backend, interval=HEALTH_INTERVAL)
+backends.start()
+
+scheduler = Scheduler(max_concurrency=MAX_CONCURRENCY, model_concurrency=MODEL_CONCURRENCY, model_limits=MODEL_LIMITS,
+                      max_queue=MAX_QUEUE, group_wait=GROUP_WAIT, queue_timeout=QUEUE_TIMEOUT)
+
+def request_priority():
+    """Read the priority class from the X-Priority header ("interactive" or "batch")."""
+    return request.headers.get('X-Priority', 'interactive').lower()
+
+@app.errorhandler(QueueFull)
+def queue_full(e):
+    return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
+
+@app.errorhandler(requests.RequestException)
+def upstream_unavailable(e):
+    return jsonify({'error': f"Ollama request failed: {e}"}), 502
+
+@app.before_request
+def start_timing():
+    if request.endpoint != 'prometheus_metrics':
+        g.timing = {'start': time.perf_counter(), 'first_chunk': None, 'final': None, 'model': None}
+        metrics.IN_FLIGHT.labels(request.endpoint).inc()
+
+@app.after_request
+def record_timing(response):
+    timing = g.get('timing')
+    if timing is None:
+        return response
+    route = request.endpoint
+
+    def finished():
+        # Runs once the (possibly streamed) body has been sent.
+        model = timing['model'] or ''
+        metrics.IN_FLIGHT.labels(route).dec()
+        metrics.REQUESTS.labels(route, response.status_code).inc()
+        metrics.DURATION.labels(route, model).observe(time.perf_counter() - timing['start'])
+        if timing['first_chunk'] is not None:
+            metrics.TTFT.labels(route, model).observe(timing['first_chunk'] - timing['start'])
+        if timing['final'] is not None:
+            metrics.observe_generation(model, timing['final'])
+        if response.status_code >= 400:
+            kind = 'queue_full' if response.status_code == 429 else f'http_{response.status_code // 100}xx'
+            metrics.ERRORS.labels(route, kind).inc()
+
+    response.call_on_close(finished)
+    return response
+
+def fetch(method, path, payload=None, stream=False, model=None, priority=None):
+    """Start an upstream request and return (status, content_type, chunks).
+
+    Streamed responses yield one NDJSON line per chunk as soon as it arrives;
+    other responses yield their whole body once. With a priority the request
+    first waits for a scheduler slot, held until the response is consumed.
+    """
+    queued = time.perf_counter()
+    ticket = scheduler.acquire(model, priority) if priority else None
+    started = time.perf_counter()
+    if ticket:
+        metrics.QUEUE_WAIT.labels(ticket.model).observe(started - queued)
+    try:
+        response = upstream(method, path, model=model, json=payload, stream=stream)
+        metrics.UPSTREAM_CONNECT.labels(path.split('/')[0]).observe(time.perf_counter() - started)
+    except Exception:
+        if ticket:
+            scheduler.release(ticket)
+        raise
+    if not stream:
+        if ticket:
+            scheduler.release(ticket)
+        return response.status_code, response.headers.get('Content-Type', 'application/json'), iter([response.content])
+
+    def lines():
+        try:
+            for line in response.iter_lines():
+                if line:
+                    yield line + b'\n'
+        finally:
+            response.close()
+            release_upstream(response)
+            if ticket:
+                scheduler.release(ticket)
+
+    return response.status_code, 'application/x-ndjson', lines()
+
+def forward(status, content_type, chunks, on_complete=None, headers=None):
+    """Relay upstream chunks to the client as they arrive.
+
+    When on_complete is given it receives the full list of NDJSON lines after a
+    successful response has been relayed to the client.
+    """
+    def relay():
+        lines = [] if on_complete and status == 200 else None
+        timing = g.get('timing')
+        try:
+            for chunk in chunks:
+                if timing is not None:
+                    if timing['first_chunk'] is None:
+                        timing['first_chunk'] = time.perf_counter()
+                    stats = metrics.final_stats(chunk)
+                    if stats is not None:
+                        timing['final'] = stats
+                if lines is not None:
+                    lines.append(chunk.rstrip(b'\n'))
+                yield chunk
+        except Exception:
+            metrics.ERRORS.labels(request.endpoint, 'stream_aborted').inc()
+            raise
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+        if lines:
+            on_complete(lines)
+
+    return Response(stream_with_context(relay()), status=status, content_type=content_type, headers=headers)
+
+flights = SingleFlight()
+
+def proxy(method, path, payload=None, stream=False, model=None, priority=None, dedupe=False, on_complete=None):
+    """Forward a request to Ollama; with dedupe, identical in-flight requests share one upstream call."""
+    if dedupe and SINGLE_FLIGHT:
+        key = json.dumps([method, path, payload], sort_keys=True)
+        call = flights.do(key, lambda: fetch(method, path, payload, stream, model, priority))
+        return forward(call.status, call.content_type, call.iter_chunks(), on_complete)
+    return forward(*fetch(method, path, payload, stream, model, priority), on_complete=on_complete)
+
+def fetch_body(method, path, payload=None, model=None):
+    """Fetch a non-streamed response as (status, body), sharing identical in-flight calls."""
+    key = json.dumps([method, path, payload], sort_keys=True)
+    call = flights.do(key, lambda: fetch(method, path, payload, model=model))
+    return call.status, b''.join(call.iter_chunks())
+
+def fetch_all_tags():
+    """Return (status, content_type, chunks) for /api/tags merged across every healthy backend.
+
+    Each model is listed once, with a ``backends`` map from host URL to the
+    digest that host has, so model_digest() can tell when hosts disagree.
+    """
+    models = {}
+    status, body = 502, json.dumps({'error': 'No backend answered /api/tags'}).encode()
+    listed = False
+    for backend in backends.healthy():
+        try:
+            response = session().get(f'{backend.url}/api/tags', timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError):
+                backends.mark_failed(backend)
+            continue
+        if response.status_code != 200:
+            status, body = response.status_code, response.content
+            continue
+        listed = True
+        for model in response.json().get('models', []):
+            entry = models.setdefault(model['name'], dict(model, backends={}))
+            entry['backends'][backend.url] = model.get('digest')
+    if listed:
+        status, body = 200, json.dumps({'models': list(models.values())}).encode()
+    return status, 'application/json', iter([body])
+
+def fetch_tags():
+    call = flights.do(json.dumps(['GET', 'tags', 'all backends']), fetch_all_tags)
+    return call.status, b''.join(call.iter_chunks())
+
+catalog = ModelCatalog(
+    fetch_tags,
+    lambda name: fetch_body('POST', 'show', {'name': name}, model=name),
+    ttl=CATALOG_TTL,
+    refresh_interval=CATALOG_REFRESH_INTERVAL,
+)
+catalog.start()
+catalog_digests = (None, {})
+
+def model_digest(name):
+    """Return the digest of a local model from the cached /api/tags listing, or None if hosts disagree."""
+    global catalog_digests
+    listing = catalog.tags()
+    if listing.status != 200:
+        return None
+    etag, digests = catalog_digests
+    if etag != listing.etag:
+        digests = {}
+        for model in json.loads(listing.body).get('models', []):
+            # A request may land on any host that has the model, so a cached
+            # response is only keyed when every host has the same version.
+            host_digests = set(model.get('backends', {}).values()) or {model.get('digest')}
+            digests[model['name']] = host_digests.pop() if len(host_digests) == 1 else None
+        catalog_digests = (listing.etag, digests)
+    return digests.get(model_tag(name))
+
+def catalog_response(entry):
+    """Serve a catalog entry, answering 304 when the client already has this version."""
+    if entry.status == 200 and entry.etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': entry.etag})
+    headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache'} if entry.status == 200 else None
+    return Response(entry.body, status=entry.status, content_type='application/json', headers=headers)
+
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL)
+
+def cached_forward(path, payload, stream, dedupe=False, on_complete=None):
+    """Forward a generation, serving deterministic (temperature 0 or seeded) repeats from the cache.
+
+    on_complete receives the NDJSON lines of every successful response,
+    including ones served from the cache.
+    """
+    g.timing['model'] = payload.get('model')
+    key = None
+    if RESPONSE_CACHE_ENABLED and is_deterministic(payload):
+        digest = model_digest(payload.get('model'))
+        if digest:
+            key = response_key(path, payload, digest)
+            lines = response_cache.get(key)
+            if lines is not None:
+                if stream:
+                    body = [line + b'\n' for line in replay(lines, stream)]
+                    return forward(200, 'application/x-ndjson', body, on_complete=on_complete, headers={'X-Cache': 'HIT'})
+                if on_complete:
+                    on_complete(lines)
+                return jsonify(replay(lines, stream)), 200, {'X-Cache': 'HIT'}
+
+    def complete(lines):
+        # Only cache generations that ran to completion.
+        if key and b'"done":true' in lines[-1]:
+            response_cache.put(key, lines)
+        if on_complete:
+            on_complete(lines)
+
+    return proxy('POST', path, payload, stream, model=payload.get('model'), priority=request_priority(),
+                 dedupe=dedupe, on_complete=complete if key or on_complete else None)
+
+session_contexts = SessionContexts(max_sessions=SESSION_CONTEXTS, ttl=SESSION_CONTEXT_TTL)
+
 @app.route('/generate', methods=['POST'])
 def generate():
     model = request.json.get('model')
@@ -16,8 +373,13 @@ def generate():
     stream = request.json.get('stream', True)
     raw = request.json.get('raw', False)
     keep_alive = request.json.get('keep_alive', 300)
+    session_id = request.json.get('session_id')
+
+    # With a session id the gateway keeps Ollama's context between turns, so
+    # the client only sends the new prompt. An explicit context still wins.
+    if session_id and context is None:
+        context = session_contexts.get(session_id, model)
 
-    url = f'http://localhost:11434/api/generate'
     payload = {
         'model': model,
         'prompt': prompt,
@@ -31,8 +393,16 @@ def generate():
         'raw': raw,
         'keep_alive': keep_alive
     }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+
+    def remember_context(lines):
+        final = json.loads(lines[-1])
+        if final.get('done') and final.get('context'):
+            session_contexts.put(session_id, model, final['context'])
+
+    return cached_forward('generate', payload, stream, dedupe=True,
+                          on_complete=remember_context if session_id else None)
+
+sessions = SessionStore(SESSIONS_FILE, max_messages=SESSION_MAX_MESSAGES, memory_sessions=SESSION_MEMORY, ttl=SESSION_TTL)
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -42,8 +412,21 @@ def chat():
     options = request.json.get('options')
     stream = request.json.get('stream', True)
     keep_alive = request.json.get('keep_alive', 300)
+    session_id = request.json.get('session_id')
+
+    on_complete = None
+    if session_id:
+        # The client sends only the new messages; the stored history is
+        # prepended, trimmed to the newest turns that fit the token budget.
+        new_messages = messages or []
+        window = ContextWindow(SESSION_MAX_TOKENS - sum(message_tokens(m) for m in new_messages))
+        messages = window.build(sessions.history(session_id)) + new_messages
+
+        def on_complete(lines):
+            final = replay(lines, stream=False)
+            if final.get('done') and 'message' in final:
+                sessions.append(session_id, new_messages + [final['message']])
 
-    url = f'http://localhost:11434/api/chat'
     payload = {
         'model': model,
         'messages': messages,
@@ -52,8 +435,22 @@ def chat():
         'stream': stream,
         'keep_alive': keep_alive
     }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+    return cached_forward('chat', payload, stream, on_complete=on_complete)
+
+@app.route('/sessions', methods=['GET'])
+def session_stats():
+    return jsonify(sessions.snapshot()), 200
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    return jsonify({'session_id': session_id, 'messages': sessions.history(session_id)}), 200
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if sessions.delete(session_id):
+        return jsonify({'message': 'Session deleted successfully'}), 200
+    else:
+        return jsonify({'error': 'Session not found'}), 404
 
 @app.route('/create', methods=['POST'])
 def create():
@@ -62,40 +459,101 @@ def create():
     stream = request.json.get('stream', True)
     path = request.json.get('path')
 
-    url = f'http://localhost:11434/api/create'
     payload = {
         'name': name,
         'modelfile': modelfile,
         'stream': stream,
         'path': path
     }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+    response = proxy('POST', 'create', payload, stream)
+    response.call_on_close(lambda: catalog.invalidate(name))
+    return response
 
 @app.route('/show', methods=['POST'])
 def show():
     name = request.json.get('name')
+    return catalog_response(catalog.show(name))
 
-    url = f'http://localhost:11434/api/show'
-    payload = {
-        'name': name
-    }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+def each_backend(method, path, payload, targets):
+    """Send a non-streamed request to each target backend and return {url: status}; unreachable hosts get 502."""
+    statuses = {}
+    for backend in targets:
+        backends.acquire(backend)
+        try:
+            response = session().request(method, f'{backend.url}/api/{path}', json=payload,
+                                         timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            statuses[backend.url] = response.status_code
+        except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError):
+                backends.mark_failed(backend)
+            statuses[backend.url] = 502
+        finally:
+            backends.release(backend)
+    return statuses
+
+def pull_everywhere(payload, stream):
+    """Pull a model onto every healthy backend at once.
+
+    Progress lines from all hosts are relayed as they arrive, each tagged with
+    its ``backend``. Without streaming the response reports success only when
+    every host finished the pull.
+    """
+    targets = backends.healthy()
+    lines = queue.Queue()
+
+    def run(backend):
+        backends.acquire(backend)
+        try:
+            with session().post(f'{backend.url}/api/pull', json=dict(payload, stream=True), stream=True,
+                                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                for line in response.iter_lines():
+                    if line:
+                        lines.put(dict(json.loads(line), backend=backend.url))
+        except (requests.RequestException, ValueError) as e:
+            if isinstance(e, requests.ConnectionError):
+                backends.mark_failed(backend)
+            lines.put({'error': f"Ollama request failed: {e}", 'backend': backend.url})
+        finally:
+            backends.release(backend)
+            lines.put(None)
+
+    for backend in targets:
+        threading.Thread(target=run, args=(backend,), daemon=True).start()
+
+    def progress():
+        running = len(targets)
+        while running:
+            line = lines.get()
+            if line is None:
+                running -= 1
+            else:
+                yield line
+
+    if stream:
+        return Response((json.dumps(line) + '\n' for line in progress()), content_type='application/x-ndjson')
+    results = {}
+    for line in progress():
+        results[line['backend']] = line
+    errors = {url: line['error'] for url, line in results.items() if 'error' in line}
+    if errors or len(results) < len(targets):
+        response = jsonify({'error': 'Pull failed on some backends', 'backends': errors})
+        response.status_code = 502
+        return response
+    return jsonify({'status': 'success', 'backends': [backend.url for backend in targets]})
 
 @app.route('/copy', methods=['POST'])
 def copy():
     source = request.json.get('source')
     destination = request.json.get('destination')
 
-    url = f'http://localhost:11434/api/copy'
     payload = {
         'source': source,
         'destination': destination
     }
-    response = requests.post(url, json=payload)
-    if response.status_code == 200:
-        return jsonify({'message': 'Model copied successfully'}), 200
+    statuses = each_backend('POST', 'copy', payload, backends.having(source))
+    catalog.invalidate(destination)
+    if 200 in statuses.values():
+        return jsonify({'message': 'Model copied successfully', 'backends': statuses}), 200
     else:
         return jsonify({'error': 'Model not found'}), 404
 
@@ -103,13 +561,13 @@ def copy():
 def delete():
     name = request.json.get('name')
 
-    url = f'http://localhost:11434/api/delete'
     payload = {
         'name': name
     }
-    response = requests.delete(url, json=payload)
-    if response.status_code == 200:
-        return jsonify({'message': 'Model deleted successfully'}), 200
+    statuses = each_backend('DELETE', 'delete', payload, backends.having(name))
+    catalog.invalidate(name)
+    if 200 in statuses.values():
+        return jsonify({'message': 'Model deleted successfully', 'backends': statuses}), 200
     else:
         return jsonify({'error': 'Model not found'}), 404
 
@@ -119,14 +577,14 @@ def pull():
     insecure = request.json.get('insecure', False)
     stream = request.json.get('stream', True)
 
-    url = f'http://localhost:11434/api/pull'
     payload = {
         'name': name,
         'insecure': insecure,
         'stream': stream
     }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+    response = pull_everywhere(payload, stream)
+    response.call_on_close(lambda: catalog.invalidate(name))
+    return response
 
 @app.route('/push', methods=['POST'])
 def push():
@@ -134,56 +592,170 @@ def push():
     insecure = request.json.get('insecure', False)
     stream = request.json.get('stream', True)
 
-    url = f'http://localhost:11434/api/push'
     payload = {
         'name': name,
         'insecure': insecure,
         'stream': stream
     }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+    return proxy('POST', 'push', payload, stream)
+
+def blob_spool_path(digest):
+    """Return the spool file for a partially uploaded blob, or None for a malformed digest."""
+    if not re.fullmatch(r'sha256[:-][0-9a-f]{64}', digest):
+        return None
+    return os.path.join(BLOB_SPOOL_DIR, digest.replace(':', '-') + '.partial')
 
 @app.route('/blobs/<digest>', methods=['HEAD'])
 def check_blob(digest):
-    url = f'http://localhost:11434/api/blobs/{digest}'
-    response = requests.head(url)
+    response = upstream('HEAD', f'blobs/{digest}')
     if response.status_code == 200:
         return jsonify({'message': 'Blob exists'}), 200
     else:
-        return jsonify({'error': 'Blob not found'}), 404
+        # Tell the client how much of an interrupted upload it can skip.
+        spool = blob_spool_path(digest)
+        offset = os.path.getsize(spool) if spool and os.path.exists(spool) else 0
+        return jsonify({'error': 'Blob not found'}), 404, {'Upload-Offset': str(offset)}
 
 @app.route('/blobs/<digest>', methods=['POST'])
 def create_blob(digest):
-    url = f'http://localhost:11434/api/blobs/{digest}'
-    files = {'file': open('model.bin', 'rb')}
-    response = requests.post(url, files=files)
-    if response.status_code == 201:
+    """Stream the request body to Ollama in fixed-size chunks, verifying its sha256 on the way.
+
+    Every chunk is also appended to a spool file. If the upload is interrupted,
+    the client sends the rest of the file with an Upload-Offset header (HEAD
+    reports the offset). The spooled prefix is then replayed to Ollama before
+    the new bytes, so the transfer does not restart from zero.
+    """
+    spool = blob_spool_path(digest)
+    if spool is None:
+        return jsonify({'error': 'Invalid digest'}), 400
+    if upstream('HEAD', f'blobs/{digest}').status_code == 200:
+        return jsonify({'message': 'Blob exists'}), 200
+
+    os.makedirs(BLOB_SPOOL_DIR, exist_ok=True)
+    spooled = os.path.getsize(spool) if os.path.exists(spool) else 0
+    try:
+        offset = int(request.headers.get('Upload-Offset', 0))
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        return jsonify({'error': 'Upload-Offset must be a non-negative integer'}), 400, {'Upload-Offset': str(spooled)}
+    if offset > spooled:
+        return jsonify({'error': 'Upload-Offset is past the received data'}), 409, {'Upload-Offset': str(spooled)}
+    with open(spool, 'ab') as file:
+        file.truncate(offset)
+
+    sha = hashlib.sha256()
+
+    def body():
+        with open(spool, 'a+b') as file:
+            file.seek(0)
+            while chunk := file.read(BLOB_CHUNK_SIZE):
+                sha.update(chunk)
+                yield chunk
+            while chunk := request.stream.read(BLOB_CHUNK_SIZE):
+                sha.update(chunk)
+                file.write(chunk)
+                file.flush()
+                yield chunk
+
+    try:
+        response = upstream('POST', f'blobs/{digest}', data=body())
+    except Exception:
+        offset = os.path.getsize(spool)
+        return jsonify({'error': 'Blob upload interrupted'}), 400, {'Upload-Offset': str(offset)}
+
+    if f'sha256:{sha.hexdigest()}' != digest.replace('-', ':', 1):
+        os.remove(spool)
+        return jsonify({'error': 'Blob digest mismatch'}), 400
+    if response.status_code in (200, 201):
+        os.remove(spool)
         return jsonify({'message': 'Blob created successfully'}), 201
     else:
         return jsonify({'error': 'Blob creation failed'}), 400
 
 @app.route('/tags', methods=['GET'])
 def list_models():
-    url = f'http://localhost:11434/api/tags'
-    response = requests.get(url)
-    return jsonify(response.json()), response.status_code
+    return catalog_response(catalog.tags())
+
+def embed_upstream(model, inputs, options, keep_alive):
+    """Embed a batch of inputs with one call to Ollama's /api/embed."""
+    payload = {
+        'model': model,
+        'input': inputs,
+        'options': options,
+        'keep_alive': keep_alive
+    }
+    response = upstream('POST', 'embed', model=model, json=payload)
+    response.raise_for_status()
+    return response.json()['embeddings']
+
+embedding_batcher = EmbeddingBatcher(
+    embed_upstream,
+    window=EMBED_BATCH_WINDOW_MS / 1000,
+    max_batch=EMBED_MAX_BATCH,
+    max_concurrency=EMBED_CONCURRENCY,
+)
+embedding_cache = EmbeddingCache(EMBED_CACHE_FILE, memory_items=EMBED_CACHE_MEMORY_ITEMS,
+                                 max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024)
 
 @app.route('/embeddings', methods=['POST'])
 def generate_embeddings():
     model = request.json.get('model')
     prompt = request.json.get('prompt')
+    prompts = request.json.get('prompts')
     options = request.json.get('options')
     keep_alive = request.json.get('keep_alive', 300)
+    g.timing['model'] = model
 
-    url = f'http://localhost:11434/api/embeddings'
-    payload = {
-        'model': model,
-        'prompt': prompt,
-        'options': options,
-        'keep_alive': keep_alive
-    }
-    response = requests.post(url, json=payload)
-    return jsonify(response.json()), response.status_code
+    def compute(texts):
+        if len(texts) == 1:
+            return [embedding_batcher.submit(model, texts[0], options, keep_alive).result()]
+        return embedding_batcher.embed_many(model, texts, options, keep_alive)
+
+    batch = prompts is not None or isinstance(prompt, list)
+    texts = (prompts if prompts is not None else prompt) if batch else [prompt]
+    # Requests are coalesced with other clients' and keyed into the cache, so
+    # bad input is refused before it reaches either.
+    if not isinstance(model, str) or not model:
+        return jsonify({'error': "'model' is required"}), 400
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        error = "'prompts' must be a list of strings" if batch else "'prompt' must be a string"
+        return jsonify({'error': error}), 400
+
+    try:
+        # Options such as num_ctx can change the vector, so only plain requests are cached.
+        embeddings = compute(texts) if options else embedding_cache.embed(model, texts, compute)
+        if batch:
+            return jsonify({'embeddings': embeddings}), 200
+        return jsonify({'embedding': embeddings[0]}), 200
+    except requests.HTTPError as e:
+        return jsonify({'error': e.response.text}), e.response.status_code
+    except requests.RequestException as e:
+        return jsonify({'error': str(e)}), 502
+
+@app.route('/embeddings/cache', methods=['GET'])
+def embedding_cache_stats():
+    return jsonify(embedding_cache.snapshot()), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/scheduler', methods=['GET'])
+def scheduler_stats():
+    return jsonify(scheduler.snapshot()), 200
+
+@app.route('/backends', methods=['GET'])
+def list_backends():
+    return jsonify(backends.snapshot()), 200
+
+@app.route('/generate/sessions', methods=['GET'])
+def session_context_stats():
+    return jsonify(session_contexts.snapshot()), 200
+
+@app.route('/responses/cache', methods=['GET'])
+def response_cache_stats():
+    return jsonify(response_cache.snapshot()), 200
 
 if __name__ == '__main__':
     app.run()
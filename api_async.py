@@ -0,0 +1,180 @@
+import os
+from configparser import ConfigParser
+
+import httpx
+from quart import Quart, Response, request, jsonify
+
+# Load configurations
+config = ConfigParser()
+config.read('config.ini')
+
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', config.get('ollama', 'host', fallback='http://localhost:11434')).rstrip('/')
+POOL_SIZE = config.getint('gateway', 'async_pool_size', fallback=1024)
+CONNECT_TIMEOUT = config.getfloat('gateway', 'connect_timeout', fallback=5.0)
+READ_TIMEOUT = config.getfloat('gateway', 'read_timeout', fallback=600.0)
+CONNECT_RETRIES = config.getint('gateway', 'connect_retries', fallback=3)
+
+app = Quart(__name__)
+client = None
+
+@app.before_serving
+async def open_client():
+    """Create the shared non-blocking client once the event loop is running."""
+    global client
+    client = httpx.AsyncClient(
+        base_url=f'{OLLAMA_HOST}/api/',
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=None),
+        transport=httpx.AsyncHTTPTransport(retries=CONNECT_RETRIES),
+    )
+
+@app.after_serving
+async def close_client():
+    await client.aclose()
+
+async def forward(method, path, stream, **kwargs):
+    """Proxy a request to Ollama, relaying NDJSON chunks as they arrive when streaming."""
+    upstream_request = client.build_request(method, path, **kwargs)
+    response = await client.send(upstream_request, stream=stream)
+    if not stream:
+        # Relay the body as-is: Ollama's error responses are not always JSON.
+        return Response(response.content, status=response.status_code,
+                        content_type=response.headers.get('Content-Type', 'application/json'))
+
+    async def relay():
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    yield line.encode() + b'\n'
+        finally:
+            await response.aclose()
+
+    return Response(relay(), status=response.status_code, mimetype='application/x-ndjson')
+
+@app.route('/generate', methods=['POST'])
+async def generate():
+    body = await request.get_json()
+    stream = body.get('stream', True)
+    payload = {
+        'model': body.get('model'),
+        'prompt': body.get('prompt'),
+        'images': body.get('images'),
+        'format': body.get('format'),
+        'options': body.get('options'),
+        'system': body.get('system'),
+        'template': body.get('template'),
+        'context': body.get('context'),
+        'stream': stream,
+        'raw': body.get('raw', False),
+        'keep_alive': body.get('keep_alive', 300)
+    }
+    return await forward('POST', 'generate', stream, json=payload)
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    body = await request.get_json()
+    stream = body.get('stream', True)
+    payload = {
+        'model': body.get('model'),
+        'messages': body.get('messages'),
+        'format': body.get('format'),
+        'options': body.get('options'),
+        'stream': stream,
+        'keep_alive': body.get('keep_alive', 300)
+    }
+    return await forward('POST', 'chat', stream, json=payload)
+
+@app.route('/create', methods=['POST'])
+async def create():
+    body = await request.get_json()
+    stream = body.get('stream', True)
+    payload = {
+        'name': body.get('name'),
+        'modelfile': body.get('modelfile'),
+        'stream': stream,
+        'path': body.get('path')
+    }
+    return await forward('POST', 'create', stream, json=payload)
+
+@app.route('/show', methods=['POST'])
+async def show():
+    body = await request.get_json()
+    return await forward('POST', 'show', False, json={'name': body.get('name')})
+
+@app.route('/copy', methods=['POST'])
+async def copy():
+    body = await request.get_json()
+    payload = {
+        'source': body.get('source'),
+        'destination': body.get('destination')
+    }
+    response = await client.post('copy', json=payload)
+    if response.status_code == 200:
+        return jsonify({'message': 'Model copied successfully'}), 200
+    else:
+        return jsonify({'error': 'Model not found'}), 404
+
+@app.route('/delete', methods=['DELETE'])
+async def delete():
+    body = await request.get_json()
+    response = await client.request('DELETE', 'delete', json={'name': body.get('name')})
+    if response.status_code == 200:
+        return jsonify({'message': 'Model deleted successfully'}), 200
+    else:
+        return jsonify({'error': 'Model not found'}), 404
+
+@app.route('/pull', methods=['POST'])
+async def pull():
+    body = await request.get_json()
+    stream = body.get('stream', True)
+    payload = {
+        'name': body.get('name'),
+        'insecure': body.get('insecure', False),
+        'stream': stream
+    }
+    return await forward('POST', 'pull', stream, json=payload)
+
+@app.route('/push', methods=['POST'])
+async def push():
+    body = await request.get_json()
+    stream = body.get('stream', True)
+    payload = {
+        'name': body.get('name'),
+        'insecure': body.get('insecure', False),
+        'stream': stream
+    }
+    return await forward('POST', 'push', stream, json=payload)
+
+@app.route('/blobs/<digest>', methods=['HEAD'])
+async def check_blob(digest):
+    response = await client.head(f'blobs/{digest}')
+    if response.status_code == 200:
+        return jsonify({'message': 'Blob exists'}), 200
+    else:
+        return jsonify({'error': 'Blob not found'}), 404
+
+@app.route('/blobs/<digest>', methods=['POST'])
+async def create_blob(digest):
+    response = await client.post(f'blobs/{digest}', content=request.body)
+    if response.status_code == 201:
+        return jsonify({'message': 'Blob created successfully'}), 201
+    else:
+        return jsonify({'error': 'Blob creation failed'}), 400
+
+@app.route('/tags', methods=['GET'])
+async def list_models():
+    return await forward('GET', 'tags', False)
+
+@app.route('/embeddings', methods=['POST'])
+async def generate_embeddings():
+    body = await request.get_json()
+    payload = {
+        'model': body.get('model'),
+        'prompt': body.get('prompt'),
+        'options': body.get('options'),
+        'keep_alive': body.get('keep_alive', 300)
+    }
+    return await forward('POST', 'embeddings', False, json=payload)
+
+if __name__ == '__main__':
+    app.run()
@@ -1,95 +1,228 @@
 import sys
 import asyncio
-from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QTextEdit, QLineEdit, QPushButton
-from PyQt6.QtCore import QThread, pyqtSignal, pyqtSlot, QObject
+import threading
+from functools import partial
+from PyQt6.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, QPushButton, QTabWidget, QComboBox
+)
+from PyQt6.QtCore import QTimer, pyqtSignal, pyqtSlot, QObject
 from PyQt6.QtGui import QTextCursor
 from ollama import AsyncClient
 
-class ChatWorker(QObject):
-    new_message = pyqtSignal(str)
-    finished = pyqtSignal()
+HOST = 'http://192.168.1.25:11434'
+DEFAULT_MODEL = 'llama3'
+MAX_CONCURRENT_GENERATIONS = 2  # Per backend; more tabs than this wait their turn.
+RENDER_FRAME_MS = 25  # Flush streamed text at 40 frames per second.
 
-    def __init__(self, client, parent=None):
-        super().__init__(parent)
-        self.client = client
+class BufferedRenderer(QObject):
+    """Collect streamed fragments from any thread and insert them into a QTextEdit once per frame.
 
-    async def chat(self, user_input):
-        message = {'role': 'user', 'content': user_input}
-        async for part in await self.client.chat(model='llama3', messages=[message], stream=True):
-            self.new_message.emit(part['message']['content'])
+    Inserting each fragment separately moves the cursor and re-lays out the
+    document for every token; here the GUI thread does one insert per frame
+    however fast the model streams. start() and finish() run on the GUI thread.
+    """
 
-    def stop(self):
-        self.finished.emit()
+    def __init__(self, text_edit, interval_ms=RENDER_FRAME_MS):
+        super().__init__(text_edit)
+        self.text_edit = text_edit
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
 
-class MainWindow(QWidget):
-    def __init__(self):
-        super().__init__()
+    def write(self, text):
+        with self.lock:
+            self.pending.append(text)
+
+    @pyqtSlot()
+    def start(self):
+        with self.lock:
+            self.pending.clear()
+        self.timer.start()
+
+    @pyqtSlot()
+    def finish(self):
+        self.timer.stop()
+        self.flush()
+
+    @pyqtSlot()
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            text = ''.join(self.pending)
+            self.pending.clear()
+        cursor = self.text_edit.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.text_edit.setTextCursor(cursor)
+        self.text_edit.ensureCursorVisible()
+
+class Backend:
+    """One Ollama host: a shared AsyncClient (and its connection pool) plus a generation cap."""
+
+    def __init__(self, host, max_concurrent=MAX_CONCURRENT_GENERATIONS):
+        self.client = AsyncClient(host=host)
+        self.slots = asyncio.Semaphore(max_concurrent)
+
+    async def chat(self, model, messages, on_text):
+        """Stream a reply into on_text once a generation slot is free."""
+        async with self.slots:
+            async for part in await self.client.chat(model=model, messages=messages, stream=True):
+                on_text(part['message']['content'])
+
+class ConversationTab(QWidget):
+    """One conversation: its own history, transcript and cancellable generation task."""
+    reply_finished = pyqtSignal(str, str)  # reply text, error ('' when the reply completed or was stopped)
+
+    def __init__(self, backend, loop, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.loop = loop
+        self.history = []
+        self.reply = []  # Fragments of the reply currently streaming
+        self.future = None
         self.init_ui()
-        self.client = AsyncClient(host='http://192.168.1.25:11434')
-        self.chat_worker = ChatWorker(self.client)
-        self.chat_thread = QThread()
-        self.chat_worker.moveToThread(self.chat_thread)
-        self.chat_worker.new_message.connect(self.append_message)
-        self.chat_thread.start()
-        self.event_loop = asyncio.new_event_loop()
-        self.chat_worker_loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.chat_worker_loop)
-        self.loop_thread = QThread()
-        self.loop_thread.run = self.chat_worker_loop.run_forever
-        self.loop_thread.start()
+        self.renderer = BufferedRenderer(self.chat_display)
+        self.reply_finished.connect(self.on_reply_finished)
 
     def init_ui(self):
-        self.setWindowTitle('Async Chat with PyQt6')
-        self.setGeometry(100, 100, 800, 600)
+        layout = QVBoxLayout()
 
-        self.layout = QVBoxLayout()
+        self.model_combobox = QComboBox()
+        self.model_combobox.setEditable(True)
+        self.model_combobox.addItem(DEFAULT_MODEL)
+        layout.addWidget(self.model_combobox)
 
         self.chat_display = QTextEdit()
         self.chat_display.setReadOnly(True)
-        self.layout.addWidget(self.chat_display)
+        layout.addWidget(self.chat_display)
 
         self.user_input = QLineEdit()
         self.user_input.returnPressed.connect(self.on_user_input)
-        self.layout.addWidget(self.user_input)
+        layout.addWidget(self.user_input)
 
+        buttons = QHBoxLayout()
         self.send_button = QPushButton("Send")
         self.send_button.clicked.connect(self.on_user_input)
-        self.layout.addWidget(self.send_button)
+        buttons.addWidget(self.send_button)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        buttons.addWidget(self.stop_button)
+        layout.addLayout(buttons)
 
-        self.setLayout(self.layout)
+        self.setLayout(layout)
+
+    def is_busy(self):
+        return self.future is not None and not self.future.done()
 
     @pyqtSlot()
     def on_user_input(self):
-        user_text = self.user_input.text()
+        user_text = self.user_input.text().strip()
+        if not user_text or self.is_busy():
+            return
         if user_text.lower() == "exit":
-            self.chat_worker.stop()
-            self.chat_thread.quit()
-            self.chat_thread.wait()
-            self.loop_thread.quit()
-            self.loop_thread.wait()
-            self.close()
-        else:
-            self.user_input.clear()
-            self.chat_display.append(f"You: {user_text}\n")
-            asyncio.run_coroutine_threadsafe(self.handle_chat(user_text), self.chat_worker_loop)
-
-    async def handle_chat(self, user_text):
-        await self.chat_worker.chat(user_text)
-
-    @pyqtSlot(str)
-    def append_message(self, message):
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        cursor.insertText(message)
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+            self.window().close()
+            return
+        self.user_input.clear()
+        self.chat_display.append(f"You: {user_text}\n")
+        self.history.append({'role': 'user', 'content': user_text})
+        self.reply = reply = []
+        self.renderer.start()
+        self.send_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.future = asyncio.run_coroutine_threadsafe(
+            self.backend.chat(self.model_combobox.currentText(), list(self.history), partial(self.on_text, reply)),
+            self.loop)
+        self.future.add_done_callback(partial(self.on_done, reply))
+
+    def on_text(self, reply, text):
+        # Runs on the asyncio thread. Fragments that arrive after Stop are dropped.
+        if reply is self.reply:
+            reply.append(text)
+            self.renderer.write(text)
+
+    def on_done(self, reply, future):
+        # Runs on the asyncio thread, or on the GUI thread when cancelled.
+        error = ''
+        if not future.cancelled() and future.exception() is not None:
+            error = str(future.exception())
+        self.reply_finished.emit(''.join(reply), error)
+
+    @pyqtSlot()
+    def stop(self):
+        """Cancel the running generation; what has streamed so far is kept."""
+        if self.is_busy():
+            self.reply = []
+            self.future.cancel()
+
+    @pyqtSlot(str, str)
+    def on_reply_finished(self, reply, error):
+        self.renderer.finish()
+        if reply:
+            self.history.append({'role': 'assistant', 'content': reply})
+        if error:
+            self.chat_display.append(f"Error: {error}")
+        self.send_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+class MainWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        # A single event loop thread runs every conversation's requests over one
+        # shared connection pool.
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name='asyncio', daemon=True)
+        self.loop_thread.start()
+        self.backend = Backend(HOST)
+        self.init_ui()
+        self.new_tab()
+
+    def init_ui(self):
+        self.setWindowTitle('Async Chat with PyQt6')
+        self.setGeometry(100, 100, 800, 600)
+
+        self.layout = QVBoxLayout()
+
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        new_tab_button = QPushButton("New Chat")
+        new_tab_button.clicked.connect(self.new_tab)
+        self.tabs.setCornerWidget(new_tab_button)
+        self.layout.addWidget(self.tabs)
+
+        self.setLayout(self.layout)
+
+    @pyqtSlot()
+    def new_tab(self):
+        tab = ConversationTab(self.backend, self.loop)
+        self.tabs.setCurrentIndex(self.tabs.addTab(tab, f"Chat {self.tabs.count() + 1}"))
+        tab.user_input.setFocus()
+
+    @pyqtSlot(int)
+    def close_tab(self, index):
+        tab = self.tabs.widget(index)
+        # stop() cancels the future and runs its done callback right away; the
+        # task itself winds down later on the loop, and its late fragments are
+        # dropped because the tab's reply list has been replaced.
+        tab.stop()
+        self.tabs.removeTab(index)
+        tab.deleteLater()
+        if self.tabs.count() == 0:
+            self.new_tab()
 
     def closeEvent(self, event):
-        self.chat_worker.stop()
-        self.chat_thread.quit()
-        self.chat_thread.wait()
-        self.loop_thread.quit()
-        self.loop_thread.wait()
+        for index in range(self.tabs.count()):
+            self.tabs.widget(index).stop()
+        try:
+            asyncio.run_coroutine_threadsafe(self.backend.client.close(), self.loop).result(timeout=2)
+        except Exception as e:
+            print(f"Failed to close the Ollama client: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=2)
         event.accept()
 
 def main():
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def model_tag(name):
+    """Ollama treats "llama3" and "llama3:latest" as the same model."""
+    return name if not name or ':' in name else f'{name}:latest'
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.loaded = set()
+        self.available = set()
+        self.checked_at = 0.0
+
+    def __repr__(self):
+        return f'Backend({self.url!r}, outstanding={self.outstanding}, healthy={self.healthy})'
+
+
+class BackendPool:
+    """Route requests across several Ollama hosts.
+
+    Requests for a model prefer hosts that already have it loaded in memory
+    (per /api/ps), then hosts that have it on disk (per /api/tags), and
+    among those the host with the fewest outstanding requests. Requests
+    without a model (blob uploads and /create) go to the first healthy host
+    in configuration order, so a blob and the /create that uses it land on
+    the same machine. Catalog operations use healthy() and having() to reach
+    every host instead.
+
+    ``probe(url)`` returns ``(loaded, available)`` model name sets or raises;
+    it runs for every host on a background thread every ``interval`` seconds.
+    """
+
+    def __init__(self, urls, probe, interval=10.0):
+        self.backends = [Backend(url) for url in urls]
+        self.probe = probe
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._health_loop, name='backend-health', daemon=True).start()
+
+    def candidates(self, model=None):
+        """Return backends in the order they should be tried; unhealthy ones come last."""
+        model = model_tag(model)
+        with self.lock:
+            if model is None:
+                ordered = list(self.backends)
+            else:
+                ordered = sorted(self.backends, key=lambda b: (model not in b.loaded, model not in b.available, b.outstanding))
+            return [b for b in ordered if b.healthy] + [b for b in ordered if not b.healthy]
+
+    def healthy(self):
+        """Return the healthy backends in configuration order, or all of them if none is healthy."""
+        with self.lock:
+            return [b for b in self.backends if b.healthy] or list(self.backends)
+
+    def having(self, model):
+        """Return the healthy backends that have model on disk, or every healthy one if none is known to."""
+        model = model_tag(model)
+        hosts = self.healthy()
+        with self.lock:
+            return [b for b in hosts if model in b.available] or hosts
+
+    def acquire(self, backend):
+        with self.lock:
+            backend.outstanding += 1
+
+    def release(self, backend, model=None):
+        with self.lock:
+            backend.outstanding -= 1
+            if model:
+                # The host loads the model to serve the request.
+                backend.loaded.add(model_tag(model))
+                backend.available.add(model_tag(model))
+
+    def mark_failed(self, backend):
+        with self.lock:
+            if backend.healthy:
+                logger.warning(f"Backend {backend.url} is unreachable, failing over")
+            backend.healthy = False
+
+    def snapshot(self):
+        with self.lock:
+            return [{
+                'url': b.url,
+                'healthy': b.healthy,
+                'outstanding': b.outstanding,
+                'loaded': sorted(b.loaded),
+            } for b in self.backends]
+
+    def check(self, backend):
+        try:
+            loaded, available = self.probe(backend.url)
+        except Exception as e:
+            if backend.healthy:
+                logger.warning(f"Health check failed for {backend.url}: {e}")
+            with self.lock:
+                backend.healthy = False
+            return
+        with self.lock:
+            if not backend.healthy:
+                logger.info(f"Backend {backend.url} is healthy again")
+            backend.healthy = True
+            backend.loaded = {model_tag(name) for name in loaded}
+            backend.available = {model_tag(name) for name in available}
+            backend.checked_at = time.time()
+
+    def _health_loop(self):
+        while True:
+            for backend in self.backends:
+                self.check(backend)
+            time.sleep(self.interval)
@@ -0,0 +1,100 @@
+"""Measure crawl throughput against a local static site: a browser per URL vs the shared-pool Crawler.
+
+    python benchmark_crawler.py --pages 40 --max-pages 8
+
+Pages are served by http.server from a temporary directory. Each page
+references an image and a web font, so the output also shows how many bytes
+the blocked resources would have cost.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from playwright.sync_api import sync_playwright
+
+from crawler import crawl, extract_text
+
+PAGE = """<!doctype html>
+<html><head><title>Page {i}</title>
+<style>@font-face {{ font-family: Bench; src: url(font.woff2); }} body {{ font-family: Bench; }}</style>
+</head><body>
+<header>Site navigation</header>
+<h1>Page {i}</h1>
+<img src="image.png?{i}">
+{paragraphs}
+<footer>Copyright</footer>
+</body></html>
+"""
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    served = 0
+    lock = threading.Lock()
+
+    def copyfile(self, source, outputfile):
+        data = source.read()
+        outputfile.write(data)
+        with CountingHandler.lock:
+            CountingHandler.served += len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def build_site(directory, pages):
+    for i in range(pages):
+        paragraphs = '\n'.join(f"<p>Paragraph {j} of page {i}. " + "Lorem ipsum dolor sit amet. " * 20 + "</p>"
+                               for j in range(20))
+        with open(os.path.join(directory, f'page{i}.html'), 'w') as f:
+            f.write(PAGE.format(i=i, paragraphs=paragraphs))
+    with open(os.path.join(directory, 'image.png'), 'wb') as f:
+        f.write(os.urandom(500 * 1024))
+    with open(os.path.join(directory, 'font.woff2'), 'wb') as f:
+        f.write(os.urandom(100 * 1024))
+
+def browser_per_url(urls, workers):
+    """The previous loader: every URL launches its own Chromium in a thread pool."""
+    def load(url):
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch()
+            page = browser.new_page()
+            page.goto(url)
+            text = extract_text(page.content())
+            browser.close()
+            return text
+    with ThreadPoolExecutor(workers) as executor:
+        return sum(1 for text in executor.map(load, urls) if text)
+
+def shared_pool(urls, max_pages, per_host):
+    docs_by_url, _ = asyncio.run(crawl(urls, max_pages=max_pages, per_host=per_host))
+    return sum(1 for docs in docs_by_url.values() if docs)
+
+def run(name, load, urls):
+    CountingHandler.served = 0
+    start = time.perf_counter()
+    loaded = load(urls)
+    elapsed = time.perf_counter() - start
+    print(f"{name:16} {loaded:4d}/{len(urls)} pages  {loaded * 60 / elapsed:8.1f} pages/min  "
+          f"{CountingHandler.served / 1024 / 1024:8.1f} MiB served")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--max-pages', type=int, default=8, help='pool size, and thread count for the baseline')
+    parser.add_argument('--per-host', type=int, default=8, help='everything is served from one host here')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    build_site(directory, args.pages)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(CountingHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_port}/page{i}.html' for i in range(args.pages)]
+
+    run('browser per URL', partial(browser_per_url, workers=args.max_pages), urls)
+    run('shared pool', partial(shared_pool, max_pages=args.max_pages, per_host=args.per_host), urls)
+    server.shutdown()
@@ -0,0 +1,168 @@
+"""Compare concurrent streaming capacity of the Flask (api.py) and async (api_async.py) gateways.
+
+A fake Ollama server streams a fixed number of NDJSON tokens per /api/generate
+call with a delay between tokens, so every generation holds its connection open
+for a while. For each concurrency level the benchmark opens that many streams
+through the gateway at once and reports completed streams, time to first token
+and the gateway's resident memory and thread count.
+
+Every stream sends a distinct prompt, so single-flight and the response cache
+cannot collapse the load into one upstream call. api_async.py has no
+scheduler, so by default the Flask gateway's scheduler limits are raised to the
+largest concurrency level for the run; pass --scheduler-limit to measure the
+Flask gateway with a tighter limit instead.
+
+    python benchmark_gateway.py --levels 50 100 200 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+GATEWAYS = {
+    'flask': ("import api; from scheduler import Scheduler; "
+              "api.scheduler = Scheduler(max_concurrency={limit}, model_concurrency={limit}, max_queue={limit}); "
+              "api.app.run(host='127.0.0.1', port={port}, threaded=True)"),
+    'async': "import api_async; api_async.app.run(host='127.0.0.1', port={port})",
+}
+
+async def fake_ollama(reader, writer, tokens, delay):
+    """Minimal HTTP/1.1 keep-alive server that streams a chunked NDJSON generation."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = header.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            if length:
+                await reader.readexactly(length)
+
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n'
+                         b'Transfer-Encoding: chunked\r\n\r\n')
+            for i in range(tokens):
+                done = i == tokens - 1
+                line = json.dumps({'model': 'bench', 'response': 'tok ', 'done': done}).encode() + b'\n'
+                writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+                await writer.drain()
+                if not done:
+                    await asyncio.sleep(delay)
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+def process_stats(pid):
+    """Return (rss_mb, threads) for a Linux process."""
+    rss, threads = 0.0, 0
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, threads
+
+async def one_stream(client, url, index):
+    start = time.perf_counter()
+    ttft = None
+    payload = {'model': 'bench', 'prompt': f'stream {index} at {time.time_ns()}'}
+    async with client.stream('POST', url, json=payload) as response:
+        async for line in response.aiter_lines():
+            if line and ttft is None:
+                ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+async def run_level(port, concurrency, pid, timeout):
+    url = f'http://127.0.0.1:{port}/generate'
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        peak = [0.0, 0]
+
+        async def sample():
+            while True:
+                rss, threads = process_stats(pid)
+                peak[0], peak[1] = max(peak[0], rss), max(peak[1], threads)
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample())
+        results = await asyncio.gather(*(one_stream(client, url, i) for i in range(concurrency)),
+                                       return_exceptions=True)
+        sampler.cancel()
+
+    ok = [r for r in results if not isinstance(r, BaseException) and r[0] is not None]
+    ttfts = sorted(r[0] for r in ok)
+    return {
+        'concurrency': concurrency,
+        'completed': len(ok),
+        'failed': len(results) - len(ok),
+        'ttft_p50_ms': round(statistics.median(ttfts) * 1000, 1) if ttfts else None,
+        'ttft_p95_ms': round(ttfts[int(len(ttfts) * 0.95) - 1] * 1000, 1) if ttfts else None,
+        'peak_rss_mb': round(peak[0], 1),
+        'peak_threads': peak[1],
+    }
+
+async def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'Gateway did not start on port {port}')
+
+async def main(args):
+    server = await asyncio.start_server(
+        lambda r, w: fake_ollama(r, w, args.tokens, args.delay), '127.0.0.1', args.upstream_port, backlog=4096)
+    env = dict(os.environ, OLLAMA_HOST=f'http://127.0.0.1:{args.upstream_port}')
+
+    limit = args.scheduler_limit or max(args.levels)
+    for mode in args.modes:
+        code = GATEWAYS[mode].format(port=args.port, limit=limit)
+        scheduler = f'max_concurrency={limit} model_concurrency={limit} max_queue={limit}' if mode == 'flask' else 'none'
+        print(json.dumps({'mode': mode, 'scheduler': scheduler}), flush=True)
+        gateway = subprocess.Popen([sys.executable, '-c', code], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            await wait_for_port(args.port)
+            for level in args.levels:
+                result = await run_level(args.port, level, gateway.pid, args.timeout)
+                print(json.dumps({'mode': mode, **result}), flush=True)
+        finally:
+            gateway.terminate()
+            gateway.wait()
+
+    server.close()
+    await server.wait_closed()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['flask', 'async'], choices=GATEWAYS)
+    parser.add_argument('--levels', nargs='+', type=int, default=[50, 100, 200, 400])
+    parser.add_argument('--tokens', type=int, default=100, help='tokens per generation')
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds between tokens')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--upstream-port', type=int, default=11499)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--scheduler-limit', type=int, default=0,
+                        help='Flask scheduler concurrency and queue limit (default: the largest level)')
+    asyncio.run(main(parser.parse_args()))
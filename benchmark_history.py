@@ -0,0 +1,56 @@
+"""Measure chat history write throughput: one thread and connection per message vs HistoryStore.
+
+    python benchmark_history.py --messages 5000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from history_store import SCHEMA, HistoryStore
+
+
+def thread_per_message(db_file, messages):
+    """The previous db_operation approach: a new thread and connection for every insert."""
+    threads = []
+    for i in range(messages):
+        def run(i=i):
+            try:
+                with sqlite3.connect(db_file) as conn:
+                    conn.execute('INSERT INTO messages (message_type, content) VALUES (?, ?)', ('Human', f'message {i}'))
+                    conn.commit()
+            except sqlite3.Error:
+                pass  # Counted as missing rows below.
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+def history_store(db_file, messages):
+    store = HistoryStore(db_file)
+    for i in range(messages):
+        store.add_message('Human', f'message {i}')
+    store.close()
+
+def run(name, writer, messages):
+    db_file = os.path.join(tempfile.mkdtemp(), 'chat_history.db')
+    with sqlite3.connect(db_file) as conn:
+        conn.execute(SCHEMA)
+    start = time.perf_counter()
+    writer(db_file, messages)
+    elapsed = time.perf_counter() - start
+
+    with sqlite3.connect(db_file) as conn:
+        rows = [content for (content,) in conn.execute('SELECT content FROM messages ORDER BY id')]
+    in_order = rows == [f'message {i}' for i in range(messages)]
+    print(f"{name:20} {len(rows):6d}/{messages} rows  {messages / elapsed:10.0f} msg/s  in order: {in_order}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    args = parser.parse_args()
+    run('thread per message', thread_per_message, args.messages)
+    run('HistoryStore', history_store, args.messages)
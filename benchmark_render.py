@@ -0,0 +1,103 @@
+"""Measure GUI-thread CPU time to render streamed tokens: one insert per token vs BufferedRenderer.
+
+    QT_QPA_PLATFORM=offscreen python benchmark_render.py --tokens 10000 --rate 2000
+
+A producer thread streams tokens at --rate tokens/second, the way the chat
+worker does, and the GUI thread renders them into a visible QTextEdit.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QApplication, QTextEdit
+
+from async_chat_pyqt6 import BufferedRenderer
+
+WORDS = ['the', ' model', ' streams', ' tokens', ' quickly', ',', ' and', ' each', ' one', ' is', ' short', '.\n']
+
+
+class Producer(QObject):
+    token = pyqtSignal(str)
+    done = pyqtSignal()
+
+    def __init__(self, tokens, rate, write=None):
+        super().__init__()
+        self.tokens = tokens
+        self.rate = rate
+        self.write = write
+
+    def run(self):
+        # Send tokens in 5 ms bursts; sleeping per token is too coarse at high rates.
+        burst = max(1, int(self.rate * 0.005))
+        sent = 0
+        start = time.perf_counter()
+        while sent < self.tokens:
+            for _ in range(min(burst, self.tokens - sent)):
+                text = WORDS[sent % len(WORDS)]
+                if self.write:
+                    self.write(text)
+                else:
+                    self.token.emit(text)
+                sent += 1
+            delay = start + sent / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.done.emit()
+
+def append_per_token(text_edit):
+    """The previous append_message slot: move the cursor and scroll for every fragment."""
+    def append(text):
+        cursor = text_edit.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        text_edit.setTextCursor(cursor)
+        text_edit.ensureCursorVisible()
+    return append
+
+def run(app, name, tokens, rate, buffered):
+    text_edit = QTextEdit()
+    text_edit.setReadOnly(True)
+    text_edit.resize(800, 600)
+    text_edit.show()
+    app.processEvents()
+
+    if buffered:
+        renderer = BufferedRenderer(text_edit)
+        producer = Producer(tokens, rate, write=renderer.write)
+        producer.done.connect(renderer.finish)
+        renderer.start()
+    else:
+        producer = Producer(tokens, rate)
+        producer.token.connect(append_per_token(text_edit))
+    producer.done.connect(lambda: QTimer.singleShot(0, app.quit))
+
+    thread = threading.Thread(target=producer.run)
+    cpu = time.thread_time()
+    start = time.perf_counter()
+    thread.start()
+    app.exec()
+    elapsed = time.perf_counter() - start
+    cpu = time.thread_time() - cpu
+    thread.join()
+
+    rendered = len(text_edit.toPlainText())
+    expected = sum(len(WORDS[i % len(WORDS)]) for i in range(tokens))
+    per_10k = cpu * 10000 / tokens
+    print(f"{name:18} GUI CPU {cpu * 1000:8.1f} ms  ({per_10k * 1000:8.1f} ms per 10k tokens)  "
+          f"wall {elapsed:6.2f} s  complete: {rendered == expected}")
+    text_edit.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=2000, help='tokens per second')
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    run(app, 'per token', args.tokens, args.rate, buffered=False)
+    run(app, 'BufferedRenderer', args.tokens, args.rate, buffered=True)
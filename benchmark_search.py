@@ -0,0 +1,54 @@
+"""Time full-text history search on a large generated chat_history database.
+
+    python benchmark_search.py --messages 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from history_store import HistoryStore
+
+WORDS = ("python install package model ollama stream token context window prompt embedding "
+         "vector index query database thread socket latency cache batch server client error "
+         "function class module import request response json config docker network gpu memory").split()
+QUERIES = ['python', 'ollama', 'embedding vector', 'gpu mem', 'docker network', 'latenc']
+
+
+def vocabulary(size=20000):
+    """Synthetic words with Zipf-distributed frequencies; the topic words sit at mid-frequency ranks."""
+    words = [f'w{rank}' for rank in range(size)]
+    for i, word in enumerate(WORDS):
+        words[100 + i * 50] = word
+    return words, list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+
+def populate(store, messages):
+    rng = random.Random(0)
+    words, cum_weights = vocabulary()
+    for i in range(messages):
+        text = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(8, 40)))
+        store.add_message('Human' if i % 2 == 0 else 'AI', text)
+    store.flush()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    store = HistoryStore(os.path.join(tempfile.mkdtemp(), 'chat_history.db'))
+    start = time.perf_counter()
+    populate(store, args.messages)
+    print(f"Inserted {args.messages} messages in {time.perf_counter() - start:.1f}s (fts5: {store.fts})")
+
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = store.search(query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{query!r:26} {len(results):3d} results  median {timings[len(timings) // 2] * 1000:7.1f} ms")
+    store.close()
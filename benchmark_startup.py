@@ -0,0 +1,71 @@
+"""Measure time until the RAG index can answer a query: cold (crawl, split, embed) vs warm (reopen the index).
+
+    python benchmark_startup.py --db /tmp/vss_startup.db --runs 5
+
+Uses the URLs, table and embedding model from config.ini, like
+contextual_ai_chatbot_v1.py. The cold run also starts with an empty
+embedding cache and an empty fetch cache, so it pays for crawling every page,
+loading the model and embedding every chunk.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import contextual_ai_chatbot_v1 as chatbot
+from embedding_cache import EmbeddingCache
+
+QUERY = "What is LangChain?"
+
+
+def remove_db(db_file):
+    for path in (db_file, db_file + '-wal', db_file + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def cold(db_file):
+    remove_db(db_file)
+    cache_dir = tempfile.mkdtemp()
+    embedding_cache = EmbeddingCache(os.path.join(cache_dir, 'embedding_cache.db'))
+    chatbot.embedding_function = chatbot.CachedEmbeddings(chatbot.EMBEDDING_MODEL, embedding_cache)
+    fetch_cache_file = chatbot.FETCH_CACHE_FILE
+    chatbot.FETCH_CACHE_FILE = os.path.join(cache_dir, 'fetch_cache.db')
+    try:
+        start = time.perf_counter()
+        db = chatbot.open_index(db_file)
+        if not chatbot.load_and_index_documents(db):
+            raise SystemExit("Cold start failed to index any documents")
+        db.similarity_search(QUERY)
+        elapsed = time.perf_counter() - start
+        db.close()
+    finally:
+        chatbot.FETCH_CACHE_FILE = fetch_cache_file
+        embedding_cache.conn.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return elapsed
+
+def warm(db_file):
+    # A fresh embedder and an uncached query per run, as for the first question
+    # after launching: the model still has to load to embed it.
+    chatbot.embedding_function = chatbot.CachedEmbeddings(chatbot.EMBEDDING_MODEL, chatbot.embedding_cache)
+    start = time.perf_counter()
+    db = chatbot.open_index(db_file)
+    db.similarity_search(f"{QUERY} ({time.time_ns()})")
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'vss_startup.db'))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    chatbot.validate_config()
+    cold_time = cold(args.db)
+    warm_times = [warm(args.db) for _ in range(args.runs)]
+    print(f"{len(chatbot.URLS)} URLs")
+    print(f"cold start  {cold_time:8.2f} s")
+    print(f"warm start  {statistics.median(warm_times):8.2f} s  (median of {args.runs})")
@@ -3,30 +3,63 @@ import requests
 import json
 from PyQt6.QtWidgets import QApplication, QMainWindow, QTextEdit, QLineEdit, QVBoxLayout, QWidget, QPushButton
 from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+
+from context_window import ContextWindow
+
+GENERATE_URL = "http://192.168.1.26:11434/api/generate"
+MODEL = "llama3"
+CONTEXT_TOKENS = 4096
 
 class ModelPullThread(QThread):
+    """Stream a generation, emitting text as it arrives and the final response with Ollama's context."""
+    chunk_received = pyqtSignal(str)
     response_received = pyqtSignal(dict)
 
-    def __init__(self, prompt, stream=False):
+    def __init__(self, prompt, context=None, model=MODEL):
         super().__init__()
         self.prompt = prompt
-        self.stream = stream
+        self.context = context
+        self.model = model
 
     def run(self):
-        url = "http://192.168.1.26:11434/api/generate"
         payload = {
-            "model": "llama3",
+            "model": self.model,
             "prompt": self.prompt,
-            "stream": self.stream
+            "stream": True
         }
+        if self.context:
+            payload["context"] = self.context
 
-        response = requests.post(url, data=json.dumps(payload))
+        try:
+            with requests.post(GENERATE_URL, data=json.dumps(payload), stream=True) as response:
+                if response.status_code != 200:
+                    self.response_received.emit({"error": f"Request failed with status code {response.status_code}"})
+                    return
+                text = []
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if "error" in data:
+                        self.response_received.emit({"error": data["error"]})
+                        return
+                    text.append(data.get("response", ""))
+                    self.chunk_received.emit(data.get("response", ""))
+                    if data.get("done"):
+                        self.response_received.emit({"response": "".join(text), "context": data.get("context"),
+                                                     "model": self.model})
+                        return
+        except requests.RequestException as e:
+            self.response_received.emit({"error": f"Request failed: {e}"})
+            return
+        self.response_received.emit({"error": "Stream ended before the response was complete"})
 
-        if response.status_code == 200:
-            response_data = response.json()
-            self.response_received.emit(response_data)
-        else:
-            self.response_received.emit({"error": f"Request failed with status code {response.status_code}"})
+def summarize(prompt):
+    """Summarise turns that no longer fit the context window; runs on a background thread."""
+    response = requests.post(GENERATE_URL, data=json.dumps({"model": MODEL, "prompt": prompt, "stream": False}))
+    response.raise_for_status()
+    return response.json()["response"]
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -53,32 +86,55 @@ class MainWindow(QMainWindow):
 
         # Initialize chat history
         self.chat_history = []
+        self.context_window = ContextWindow(CONTEXT_TOKENS, summarize=summarize)
+        # Ollama's token context for this conversation and the model it belongs to
+        self.context = None
+        self.context_model = None
+        self.thread = None
 
     def send_message(self):
         user_message = self.input_line.text().strip()
-        if user_message:
+        if user_message and not (self.thread and self.thread.isRunning()):
             self.chat_history.append({"role": "user", "content": user_message})
             self.input_line.clear()
             self.text_edit.append(f"User: {user_message}")
+            self.text_edit.append("Assistant: ")
 
-            prompt = self.construct_prompt()
-            self.thread = ModelPullThread(prompt, stream=False)
+            # Continue from Ollama's context when it came from the same model and
+            # still fits the budget; otherwise send the rebuilt conversation.
+            if self.context and self.context_model == MODEL and len(self.context) < CONTEXT_TOKENS:
+                prompt, context = user_message, self.context
+            else:
+                prompt, context = self.construct_prompt(), None
+            self.thread = ModelPullThread(prompt, context)
+            self.thread.chunk_received.connect(self.append_chunk)
             self.thread.response_received.connect(self.handle_response)
+            self.send_button.setEnabled(False)
             self.thread.start()
 
+    def append_chunk(self, text):
+        cursor = self.text_edit.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.text_edit.setTextCursor(cursor)
+
     def construct_prompt(self):
+        messages = self.context_window.build(self.chat_history[:-1], question=self.chat_history[-1]['content'])
         prompt = ""
-        for message in self.chat_history[-5:]:
+        for message in messages:
             prompt += f"{message['role'].capitalize()}: {message['content']}\n"
         return prompt
 
     def handle_response(self, response_data):
+        self.send_button.setEnabled(True)
         if "error" in response_data:
             self.text_edit.append(f"Error: {response_data['error']}")
+            self.context = None
         else:
             response_text = response_data["response"]
-            self.text_edit.append(f"Assistant: {response_text}")
             self.chat_history.append({"role": "assistant", "content": response_text})
+            self.context = response_data.get("context")
+            self.context_model = response_data["model"]
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,43 +1,42 @@
 import sys
 import os
+import atexit
 import re
-import sqlite3
 import threading
 import requests
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QTextEdit,
-    QLineEdit, QPushButton, QHBoxLayout, QComboBox, QFileDialog
+    QLineEdit, QPushButton, QHBoxLayout, QComboBox, QFileDialog,
+    QListView, QAbstractItemView, QListWidget
 )
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtCore import pyqtSignal, Qt, QAbstractListModel, QModelIndex, QTimer, QThread
 from langchain_community.chat_models import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain.memory import ConversationBufferMemory
 from langchain_core.prompts import ChatPromptTemplate
 
+from context_window import ContextWindow
+from history_store import HistoryStore
+
 API_BASE_URL = "http://192.168.1.26:11434/api"
 DB_FILE = 'chat_history.db'
 DEFAULT_MODEL = "default_model"
 WINDOW_TITLE = "Chat UI"
 EDITOR_TITLE = "Text Editor"
 TEXT_FILE_TYPES = "Text Files (*.py);;All Files (*)"
+HISTORY_PAGE_SIZE = 100
+STREAM_FRAME_MS = 33  # Repaint streamed tokens at roughly 30 frames per second.
+SPEAKER_LABELS = {'Human': 'You', 'AI': 'AI'}
+CONTEXT_TOKENS = 4096  # Prompt budget for history, editor content and the new message.
+PROMPT_ROLES = {'system': 'system', 'user': 'human', 'assistant': 'ai'}
 
-def db_operation(func):
-    def wrapper(*args, **kwargs):
-        def run():
-            try:
-                func(*args, **kwargs)
-            except Exception as e:
-                print(f"Error in database operation: {e}")
-        threading.Thread(target=run).start()
-    return wrapper
+history = HistoryStore(DB_FILE)
+atexit.register(history.close)
 
-@db_operation
 def add_message_to_db(message_type, content):
-    """Add messages to the database."""
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('INSERT INTO messages (message_type, content) VALUES (?, ?)', (message_type, content))
-        conn.commit()
+    """Queue a message for the history writer."""
+    history.add_message(message_type, content)
 
 class EditorWindow(QMainWindow):
     """Text Editor Window for opening and applying file contents."""
@@ -86,10 +85,114 @@ class EditorWindow(QMainWindow):
         """Return the current contents of the file."""
         return self.file_contents
 
+class GenerationThread(QThread):
+    """Stream a model response off the GUI thread.
+
+    Tokens are collected in a buffer that the GUI drains on a timer with
+    take(), so a fast model causes one repaint per frame rather than one
+    signal per token.
+    """
+
+    completed = pyqtSignal(str, bool, str)  # full response, whether it was stopped early, error message or ""
+
+    def __init__(self, client, prompt, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.prompt = prompt
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+
+    def run(self):
+        parts = []
+        error = ''
+        stream = self.client.stream(self.prompt)
+        try:
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    break
+                parts.append(chunk.content)
+                with self.lock:
+                    self.buffer.append(chunk.content)
+        except Exception as e:
+            print(f"An error occurred while streaming the response: {e}")
+            error = str(e) or type(e).__name__
+        finally:
+            # Closing the generator closes the HTTP response, which stops Ollama generating.
+            stream.close()
+        self.completed.emit(''.join(parts), self.cancelled.is_set(), error)
+
+    def take(self):
+        """Return and clear the text received since the last call."""
+        with self.lock:
+            text = ''.join(self.buffer)
+            self.buffer.clear()
+        return text
+
+    def cancel(self):
+        self.cancelled.set()
+
+class TranscriptModel(QAbstractListModel):
+    """List model of chat messages; the view only lays out and paints the rows on screen."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.messages = []  # [id, message_type, content]; id is None until reloaded from the database
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        _, message_type, content = self.messages[index.row()]
+        return f"{SPEAKER_LABELS.get(message_type, message_type)}: {content}"
+
+    def oldest_id(self):
+        return next((message[0] for message in self.messages if message[0] is not None), None)
+
+    def reset(self, rows):
+        self.beginResetModel()
+        self.messages = [list(row) for row in rows]
+        self.endResetModel()
+
+    def prepend(self, rows):
+        if rows:
+            self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+            self.messages[:0] = [list(row) for row in rows]
+            self.endInsertRows()
+
+    def append_message(self, message_type, content):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append([None, message_type, content])
+        self.endInsertRows()
+
+    def update_last(self, content):
+        if self.messages:
+            self.messages[-1][2] = content
+            index = self.index(len(self.messages) - 1)
+            self.dataChanged.emit(index, index)
+
+    def append_to_last(self, text):
+        if self.messages:
+            self.messages[-1][2] += text
+            index = self.index(len(self.messages) - 1)
+            self.dataChanged.emit(index, index)
+
+    def remove_last(self):
+        if self.messages:
+            row = len(self.messages) - 1
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.messages.pop()
+            self.endRemoveRows()
+
 class ChatWindow(QMainWindow):
     """Main Chat Window for handling interactions and displaying the chat interface."""
 
-    update_ui = pyqtSignal(list)
+    update_ui = pyqtSignal(list, bool)
+    models_loaded = pyqtSignal(list)
+    search_finished = pyqtSignal(str, list)
 
     def __init__(self):
         super().__init__()
@@ -101,12 +204,44 @@ class ChatWindow(QMainWindow):
 
     def setup_ui(self):
         """Set up the chat UI layout."""
-        self.text_edit = QTextEdit()
-        self.text_edit.setReadOnly(True)
+        self.transcript = TranscriptModel(self)
+        self.transcript_view = QListView()
+        self.transcript_view.setModel(self.transcript)
+        self.transcript_view.setWordWrap(True)
+        self.transcript_view.setSpacing(4)
+        self.transcript_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.transcript_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.transcript_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        scroll_bar = self.transcript_view.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.on_transcript_scrolled)
+        scroll_bar.rangeChanged.connect(self.restore_scroll_anchor)
+        self.update_ui.connect(self.show_history_page)
+        self.loading_history = False
+        self.history_exhausted = False
+        self.scroll_anchor = None
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search history")
+        self.search_input.textChanged.connect(self.schedule_search)
+        self.search_results = QListWidget()
+        self.search_results.setWordWrap(True)
+        self.search_results.hide()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_finished.connect(self.show_search_results)
         self.input_text = QLineEdit()
         self.input_text.returnPressed.connect(self.send_message)
         self.send_button = QPushButton("Send")
         self.send_button.clicked.connect(self.send_message)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_generation)
+        self.stop_button.setEnabled(False)
+        self.generation = None
+        self.unsaved_last_row = False
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(STREAM_FRAME_MS)
+        self.stream_timer.timeout.connect(self.flush_stream)
         self.delete_button = QPushButton("Delete Last Line")
         self.delete_button.clicked.connect(self.delete_last_message)
         self.editor_button = QPushButton("Open Editor")
@@ -116,12 +251,15 @@ class ChatWindow(QMainWindow):
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.send_button)
+        button_layout.addWidget(self.stop_button)
         button_layout.addWidget(self.delete_button)
         button_layout.addWidget(self.editor_button)
         button_layout.addWidget(self.model_combobox)
 
         layout = QVBoxLayout()
-        layout.addWidget(self.text_edit)
+        layout.addWidget(self.search_input)
+        layout.addWidget(self.search_results)
+        layout.addWidget(self.transcript_view)
         layout.addWidget(self.input_text)
         layout.addLayout(button_layout)
 
@@ -136,9 +274,15 @@ class ChatWindow(QMainWindow):
         self.editor_window.show()
 
     def populate_model_combobox(self):
-        """Populate the combobox with available models."""
-        models = self.list_local_models()
-        self.model_combobox.addItems(models)
+        """Populate the combobox with available models without blocking startup on the network."""
+        self.models_loaded.connect(self.model_combobox.addItems)
+        self.model_combobox.currentTextChanged.connect(self.change_model)
+        threading.Thread(target=lambda: self.models_loaded.emit(self.list_local_models()), daemon=True).start()
+
+    def change_model(self, model):
+        """Switch the chat client to the selected model, keeping the conversation memory."""
+        if model and hasattr(self, 'ollama_client'):
+            self.ollama_client = ChatOllama(model=model)
 
     def list_local_models(self):
         """Fetch model names from the API."""
@@ -155,33 +299,101 @@ class ChatWindow(QMainWindow):
         try:
             self.ollama_client = ChatOllama(model=selected_model)
             self.memory = ConversationBufferMemory()
+            self.context_window = ContextWindow(CONTEXT_TOKENS, summarize=self.summarize_history)
             self.output_parser = StrOutputParser()
             self.load_chat_history()
         except Exception as e:
             print(f"Failed to initialize chat components or memory with model {selected_model}: {e}")
             raise
 
-    def load_chat_history(self):
-        """Load chat history from the database."""
+    def load_chat_history(self, older=False):
+        """Load the newest page of chat history, or the page before the oldest one shown."""
+        if self.loading_history or (older and self.history_exhausted):
+            return
+        self.loading_history = True
+        before_id = self.transcript.oldest_id() if older else None
+        if older and before_id is None:
+            self.loading_history = False
+            return
+
         def fetch_history():
-            with sqlite3.connect(DB_FILE) as conn:
-                c = conn.cursor()
-                c.execute('SELECT id, message_type, content FROM messages ORDER BY id')
-                history = c.fetchall()
-                self.update_ui.emit(history)
-        threading.Thread(target=fetch_history).start()
+            try:
+                rows = history.fetch_page(before_id, HISTORY_PAGE_SIZE)
+            except Exception as e:
+                print(f"Failed to load chat history: {e}")
+                rows = []
+            self.update_ui.emit(rows, not older)
+        threading.Thread(target=fetch_history, daemon=True).start()
+
+    def show_history_page(self, rows, reset):
+        """Show a page of history fetched by load_chat_history."""
+        self.loading_history = False
+        self.history_exhausted = len(rows) < HISTORY_PAGE_SIZE
+        if reset:
+            self.unsaved_last_row = False
+            self.transcript.reset(rows)
+            self.transcript_view.scrollToBottom()
+        else:
+            bar = self.transcript_view.verticalScrollBar()
+            self.scroll_anchor = bar.maximum() - bar.value()
+            self.transcript.prepend(rows)
+
+    def on_transcript_scrolled(self, value):
+        """Fetch older messages when the transcript is scrolled to the top."""
+        if value == self.transcript_view.verticalScrollBar().minimum() and self.transcript.rowCount():
+            self.load_chat_history(older=True)
+
+    def restore_scroll_anchor(self, minimum, maximum):
+        """Keep the same messages on screen after older ones are inserted above them."""
+        if self.scroll_anchor is not None:
+            self.transcript_view.verticalScrollBar().setValue(maximum - self.scroll_anchor)
+            self.scroll_anchor = None
+
+    def schedule_search(self):
+        """Debounce typing in the search box."""
+        self.search_timer.start()
+
+    def run_search(self):
+        """Search the history index on a background thread."""
+        query = self.search_input.text()
+        if not query.strip():
+            self.search_results.clear()
+            self.search_results.hide()
+            return
+
+        def search():
+            try:
+                results = history.search(query)
+            except Exception as e:
+                print(f"History search failed: {e}")
+                results = []
+            self.search_finished.emit(query, results)
+        threading.Thread(target=search, daemon=True).start()
+
+    def show_search_results(self, query, results):
+        """Show ranked search results, ignoring answers to outdated queries."""
+        if query != self.search_input.text():
+            return
+        self.search_results.clear()
+        for _, message_type, snippet in results:
+            self.search_results.addItem(f"{SPEAKER_LABELS.get(message_type, message_type)}: {snippet}")
+        if not results:
+            self.search_results.addItem("No matches")
+        self.search_results.show()
 
     def send_message(self):
         """Send a message and process it."""
         message = self.input_text.text()
-        if message:
+        if message and not self.generation:
             add_message_to_db('Human', message)
             self.process_message(message)
 
     def process_message(self, message):
         """Process a sent message and update the UI."""
         self.memory.chat_memory.add_user_message(message)
-        self.text_edit.append(f"You: {message}\n")
+        self.unsaved_last_row = False
+        self.transcript.append_message('Human', message)
+        self.transcript_view.scrollToBottom()
         self.input_text.clear()
         self.interact_with_model(message)
 
@@ -223,8 +435,7 @@ class ChatWindow(QMainWindow):
                 print("Missing required keys in the template")
                 return
 
-            response = self.ollama_client.invoke(formatted_messages)
-            self.display_response(response)
+            self.start_generation(formatted_messages)
         except KeyError as e:
             print(f"KeyError: Missing key in template: {e}")
         except Exception as e:
@@ -254,34 +465,101 @@ class ChatWindow(QMainWindow):
 
 
     def format_history(self, message):
-        """Format chat history for prompting the AI model."""
-        recent_messages = self.memory.chat_memory.messages[-5:]
-        formatted_history = []
-        for msg in recent_messages:
+        """Fit chat history, the message and any open editor file into the model's context window.
+
+        The newest turns are kept verbatim; older ones are summarised in the
+        background by summarize_history().
+        """
+        history = []
+        for msg in self.memory.chat_memory.messages[:-1]:  # The last entry is the message being sent.
             if isinstance(msg, HumanMessage):
-                formatted_history.append(('human', msg.content))
+                history.append({'role': 'user', 'content': msg.content})
             elif isinstance(msg, AIMessage):
-                formatted_history.append(('ai', msg.content))
+                history.append({'role': 'assistant', 'content': msg.content})
             else:
                 print(f"Unexpected message type: {type(msg)}")
-        formatted_history.append(('human', message))
-        if self.editor_window and self.editor_window.isVisible() and self.editor_window.get_file_contents():
-            formatted_history.append(('human', self.editor_window.get_file_contents()))
-        return formatted_history
-
-    def display_response(self, response):
-        """Display the response from the AI model."""
-        parsed_response = response.content if isinstance(response, AIMessage) else self.output_parser.parse(response)
+        editor = None
+        if self.editor_window and self.editor_window.isVisible():
+            editor = self.editor_window.get_file_contents() or None
+        messages = self.context_window.build(history, question=message, editor=editor)
+        return [(PROMPT_ROLES[msg['role']], msg['content']) for msg in messages]
+
+    def summarize_history(self, prompt):
+        """Summarise evicted turns with the current model; called from a background thread."""
+        return self.ollama_client.invoke(prompt).content
+
+    def start_generation(self, prompt):
+        """Stream the model's answer into a new transcript row."""
+        self.transcript.append_message('AI', '')
+        self.transcript_view.scrollToBottom()
+        self.generation = GenerationThread(self.ollama_client, prompt, self)
+        self.generation.completed.connect(self.display_response)
+        self.generation.finished.connect(self.generation.deleteLater)
+        self.send_button.setEnabled(False)
+        # The streaming row is the last one, so deleting it now would misdirect the reply.
+        self.delete_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.stream_timer.start()
+        self.generation.start()
+
+    def flush_stream(self):
+        """Append the tokens received since the last frame."""
+        text = self.generation.take() if self.generation else ''
+        if text:
+            self.transcript.append_to_last(text)
+            self.transcript_view.doItemsLayout()
+            self.transcript_view.scrollToBottom()
+
+    def stop_generation(self):
+        """Cancel the response that is currently streaming."""
+        if self.generation:
+            self.generation.cancel()
+            self.stop_button.setEnabled(False)
+
+    def display_response(self, response, cancelled, error):
+        """Finish a streamed response and store it; a stopped response keeps the text received so far.
+
+        A failed response is not stored: an empty row is removed and a partial
+        one is marked as interrupted.
+        """
+        self.flush_stream()
+        self.stream_timer.stop()
+        self.generation = None
+        self.send_button.setEnabled(True)
+        self.delete_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        parsed_response = self.output_parser.parse(response)
+        if error:
+            if parsed_response:
+                self.transcript.update_last(f"{parsed_response}\n[Response interrupted: {error}]")
+                self.unsaved_last_row = True
+            else:
+                self.transcript.remove_last()
+            return
+        if cancelled and not parsed_response:
+            self.transcript.remove_last()
+            return
         add_message_to_db('AI', parsed_response)
         self.memory.chat_memory.add_ai_message(parsed_response)
-        self.text_edit.append(f"AI: {parsed_response}\n")
+        self.transcript.update_last(parsed_response)
 
     def delete_last_message(self):
         """Delete the last message from the chat history."""
-        with sqlite3.connect(DB_FILE) as conn:
-            conn.execute('DELETE FROM messages WHERE id = (SELECT MAX(id) FROM messages)')
-            conn.commit()
-        self.load_chat_history()
+        if self.generation:
+            return
+        # An interrupted reply is only on screen, not in the database.
+        if not self.unsaved_last_row:
+            history.delete_last_message()
+        self.unsaved_last_row = False
+        self.transcript.remove_last()
+
+    def closeEvent(self, event):
+        """Stop any running generation and write queued messages before the window closes."""
+        if self.generation:
+            self.generation.cancel()
+            self.generation.wait(2000)
+        history.close()
+        event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
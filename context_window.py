@@ -0,0 +1,160 @@
+import logging
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Role, separators and template tokens that every message adds on top of its text.
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = """Summarize the conversation below in a few sentences. Keep names, facts, decisions and open questions; drop small talk.
+
+{previous}{transcript}
+
+Summary:"""
+
+
+@lru_cache(maxsize=1)
+def tokenizer():
+    """Load the tiktoken encoding once; None when tiktoken is not installed."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Count tokens with tiktoken when available, else estimate about four characters per token.
+
+    Neither matches the served model's tokenizer exactly, so budgets should
+    leave some headroom.
+    """
+    if not text:
+        return 0
+    encoding = tokenizer()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def message_tokens(message):
+    return count_tokens(message['content']) + MESSAGE_OVERHEAD
+
+def truncate_to_tokens(text, tokens):
+    """Cut text to roughly the given number of tokens, keeping the start."""
+    if count_tokens(text) <= tokens:
+        return text
+    encoding = tokenizer()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max(tokens, 0)])
+    return text[:max(tokens, 0) * 4]
+
+
+class ContextWindow:
+    """Fit conversation history, retrieved context and editor content into a token budget.
+
+    build() returns chat messages (role/content dicts) totalling at most
+    ``max_tokens``. The system prompt and the new question are always kept.
+    Retrieved context and editor content are each capped to a share of what
+    is left. The rest goes to the newest turns of history. Turns that no
+    longer fit are summarised on a background thread with
+    ``summarize(prompt) -> str``. The summary is added to the system message
+    in later calls, so old turns leave a trace without growing the prompt.
+
+    One ContextWindow belongs to one conversation, whose history is passed in
+    full (oldest first) on every call.
+    """
+
+    def __init__(self, max_tokens=4096, summarize=None, context_share=0.4, summary_share=0.15):
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.context_share = context_share
+        self.summary_share = summary_share
+        self.summary = ''
+        self.summarized = 0  # history[:summarized] is folded into the summary
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+    def build(self, history, question=None, context=None, editor=None, system=None):
+        question_message = {'role': 'user', 'content': question} if question else None
+        budget = self.max_tokens - (message_tokens(question_message) if question_message else 0)
+
+        with self.lock:
+            summary = self.summary
+            summarized = self.summarized
+
+        system_parts = [system] if system else []
+        if summary:
+            system_parts.append("Summary of the earlier conversation: " +
+                                truncate_to_tokens(summary, int(self.max_tokens * self.summary_share)))
+        if context:
+            share = int(max(budget - count_tokens('\n'.join(system_parts)), 0) * self.context_share)
+            system_parts.append(f"Context: {truncate_to_tokens(context, share)}")
+        messages = [{'role': 'system', 'content': '\n'.join(system_parts)}] if system_parts else []
+        budget -= sum(message_tokens(m) for m in messages)
+
+        editor_message = None
+        if editor:
+            editor_message = {'role': 'user', 'content': truncate_to_tokens(editor, int(max(budget, 0) * self.context_share))}
+            budget -= message_tokens(editor_message)
+
+        kept = []
+        start = len(history)
+        for message in reversed(history[summarized:]):
+            cost = message_tokens(message)
+            if cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+            start -= 1
+        kept.reverse()
+
+        if start > summarized:
+            self._summarize_later(history[summarized:start], start)
+
+        messages += kept
+        if editor_message:
+            messages.append(editor_message)
+        if question_message:
+            messages.append(question_message)
+        return messages
+
+    def reset(self):
+        with self.lock:
+            self.summary = ''
+            self.summarized = 0
+
+    def _summarize_later(self, evicted, upto):
+        """Fold evicted turns into the running summary without blocking the caller."""
+        with self.lock:
+            if self.summarize is None:
+                # Nothing to summarise with; just stop considering the dropped turns.
+                self.summarized = upto
+                return
+            if self.summarizing:
+                return
+            self.summarizing = True
+            previous = self.summary
+
+        def run():
+            transcript = '\n'.join(f"{m['role'].capitalize()}: {m['content']}" for m in evicted)
+            prompt = SUMMARY_PROMPT.format(
+                previous=f"Earlier summary: {previous}\n\n" if previous else '', transcript=transcript)
+            try:
+                summary = self.summarize(prompt).strip()
+            except Exception as e:
+                logger.error(f"Failed to summarize conversation history: {e}")
+                summary = None
+            with self.lock:
+                if summary:
+                    self.summary = summary
+                    self.summarized = upto
+                self.summarizing = False
+
+        threading.Thread(target=run, name='context-summarizer', daemon=True).start()
@@ -7,18 +7,27 @@ import ollama
 from bs4 import BeautifulSoup as Soup
 from langchain_community.document_loaders import PlaywrightURLLoader
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import SQLiteVSS
 from langchain_text_splitters import CharacterTextSplitter
 from playwright.sync_api import sync_playwright
 
+from context_window import ContextWindow
+from document_index import DocumentIndex, start_refresher
+
 # Initialize the client
 client = ollama.Client(host='http://localhost:11434')
 
+# Token budget for the prompt: retrieved context, chat history and the new question
+CONTEXT_TOKENS = 4096
+
+# Index location, and how often (seconds) sources are re-crawled while chatting
+DB_FILE = '/tmp/vss.db'
+TABLE = 'state_union'
+REFRESH_INTERVAL = 3600
+
 # Create a function to handle streaming responses with context
-def stream_chat_response_with_context(model, messages, context):
-    # Add context to the beginning of the messages
-    context_message = {'role': 'system', 'content': context}
-    messages_with_context = [context_message] + messages
+def stream_chat_response_with_context(model, messages, context, window):
+    # Fit the context, as much recent history as the budget allows and the question
+    messages_with_context = window.build(messages[:-1], question=messages[-1]['content'], context=context)
 
     # Call the chat function with streaming enabled
     stream = client.chat(
@@ -44,20 +53,19 @@ def load_documents_from_urls(urls):
     docs = loader.load()
     return docs
 
-# Function to load and index documents
-def load_and_index_documents(docs, db_file='/tmp/vss.db', table='state_union'):
+# Function to group loaded documents by the URL they came from
+def load_documents_by_url(urls):
+    docs_by_url = {url: [] for url in urls}
+    for doc in load_documents_from_urls(urls):
+        docs_by_url.setdefault(doc.metadata.get('source'), []).append(doc)
+    return docs_by_url
+
+# Function to open the persistent index; only new or changed chunks get embedded on update
+embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+
+def open_index(db_file=DB_FILE, table=TABLE):
     text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    docs_split = text_splitter.split_documents(docs)
-    texts = [doc.page_content for doc in docs_split]
-    
-    embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    db = SQLiteVSS.from_texts(
-        texts=texts,
-        embedding=embedding_function,
-        table=table,
-        db_file=db_file,
-    )
-    return db
+    return DocumentIndex(db_file, table, embedding_function, text_splitter)
 
 # Function to query the indexed documents for context
 def query_documents(db, query):
@@ -68,6 +76,8 @@ def query_documents(db, query):
 def loop_chat(db):
     model = 'llama3'
     messages = []
+    # Turns that fall out of the budget are summarised in the background
+    window = ContextWindow(CONTEXT_TOKENS, summarize=lambda prompt: client.generate(model=model, prompt=prompt)['response'])
 
     while True:
         user_input = input("\nYou: ")  # Ensuring "You: " starts on a new line
@@ -82,7 +92,7 @@ def loop_chat(db):
         print(f"Context: {context}")
 
         # Stream the response with context
-        full_response = stream_chat_response_with_context(model, messages, context)
+        full_response = stream_chat_response_with_context(model, messages, context, window)
         
         # Add the AI response to messages for context in future interactions
         messages.append({'role': 'assistant', 'content': full_response})
@@ -90,14 +100,23 @@ def loop_chat(db):
 # URLs to load
 urls = ["https://python.langchain.com/v0.2/docs/introduction/"]
 
-# Load documents from the specified URLs
-docs = load_documents_from_urls(urls)
+# Open the index left by an earlier run
+db = open_index()
+
+if db.indexed_urls():
+    # Warm start: chat right away and re-crawl the sources in the background
+    print(f"Using the existing index in {DB_FILE}; refreshing sources in the background")
+    start_refresher(db, open_index, lambda: load_documents_by_url(urls), REFRESH_INTERVAL)
+else:
+    # Cold start: load the documents from the specified URLs
+    docs_by_url = load_documents_by_url(urls)
 
-# Print the number of documents loaded
-print(f"Number of documents loaded: {len(docs)}")
+    # Print the number of documents loaded
+    print(f"Number of documents loaded: {sum(len(docs) for docs in docs_by_url.values())}")
 
-# Index the loaded documents
-db = load_and_index_documents(docs)
+    # Index the loaded documents
+    db.update(docs_by_url)
+    start_refresher(db, open_index, lambda: load_documents_by_url(urls), REFRESH_INTERVAL, delay=REFRESH_INTERVAL)
 
 # Start the interactive loop chat
 loop_chat(db)
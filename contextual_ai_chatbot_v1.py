@@ -2,16 +2,20 @@ import warnings
 import logging
 import asyncio
 from configparser import ConfigParser
-from concurrent.futures import ThreadPoolExecutor
 
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*resume_download.*")
 
 import ollama
-from langchain_community.document_loaders import PlaywrightURLLoader
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import SQLiteVSS
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import CharacterTextSplitter
 
+from context_window import ContextWindow
+from crawler import load_pages
+from document_index import DocumentIndex, start_refresher
+from embedding_cache import EmbeddingCache
+from fetch_cache import FetchCache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -33,23 +37,58 @@ MODEL_NAME = config.get('ollama', 'model_name', fallback='llama3')
 DB_FILE = config.get('database', 'file', fallback='/tmp/vss.db')
 TABLE_NAME = config.get('database', 'table', fallback='state_union')
 URLS = [url.strip() for url in config.get('documents', 'urls', fallback='').split('\n') if url.strip()]
+WARM_START = config.getboolean('documents', 'warm_start', fallback=True)
+REFRESH_INTERVAL = config.getfloat('documents', 'refresh_interval', fallback=3600.0)
+CRAWLER_MAX_PAGES = config.getint('crawler', 'max_pages', fallback=8)
+CRAWLER_PER_HOST = config.getint('crawler', 'per_host', fallback=2)
+CRAWLER_TIMEOUT = config.getfloat('crawler', 'timeout', fallback=30.0)
+FETCH_CACHE_FILE = config.get('fetch_cache', 'file', fallback='fetch_cache.db')
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBED_CACHE_FILE = config.get('embedding_cache', 'file', fallback='embedding_cache.db')
+EMBED_CACHE_MEMORY_ITEMS = config.getint('embedding_cache', 'memory_items', fallback=10000)
+EMBED_CACHE_MAX_MB = config.getint('embedding_cache', 'max_mb', fallback=1024)
+CONTEXT_TOKENS = config.getint('context', 'max_tokens', fallback=4096)
 
 # Initialize the client
 client = ollama.Client(host=HOST)
 
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only computes vectors missing from the shared EmbeddingCache."""
+
+    def __init__(self, model_name, cache):
+        self.model_name = model_name
+        self.cache = cache
+        self.embedder = None
+
+    def _compute(self, texts):
+        if self.embedder is None:
+            # Loading the transformer is slow, so skip it when every chunk is cached.
+            self.embedder = SentenceTransformerEmbeddings(model_name=self.model_name)
+        return self.embedder.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        return self.cache.embed(self.model_name, list(texts), self._compute)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+embedding_cache = EmbeddingCache(EMBED_CACHE_FILE, memory_items=EMBED_CACHE_MEMORY_ITEMS,
+                                 max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024)
+embedding_function = CachedEmbeddings(EMBEDDING_MODEL, embedding_cache)
+
 def validate_config():
     if not URLS:
         logger.error("No URLs specified in the configuration.")
         raise ValueError("URL list is empty. Please provide URLs to load documents.")
 
-def stream_chat_response_with_context(model, messages, context):
+def stream_chat_response_with_context(model, messages, context, window):
     system_prompt = """
     You are a helpful assistant. This client is using the LangChain framework to build applications powered by large language models (LLMs). 
     The client expects detailed, context-aware responses that utilize the context provided from their indexed documents. 
     Always base your responses on the given context and aim to assist in developing, debugging, or explaining aspects of LangChain applications.
     """
-    context_message = {"role": "system", "content": system_prompt + f"Context: {context}"}
-    messages_with_context = [context_message] + messages
+    messages_with_context = window.build(messages[:-1], question=messages[-1]['content'],
+                                         context=context, system=system_prompt)
 
     stream = client.chat(
         model=model,
@@ -66,46 +105,41 @@ def stream_chat_response_with_context(model, messages, context):
     print()
     return full_response
 
-async def load_documents_from_urls(urls):
-    with ThreadPoolExecutor() as executor:
-        loop = asyncio.get_event_loop()
-        tasks = [loop.run_in_executor(executor, load_document, url) for url in urls]
-        return await asyncio.gather(*tasks)
+def load_documents_by_url(urls=URLS):
+    """Fetch urls and return {url: docs}; a URL that failed to load maps to an empty list.
 
-def load_document(url):
+    Unchanged pages come from the fetch cache, static pages skip the browser.
+    """
+    cache = FetchCache(FETCH_CACHE_FILE)
     try:
-        logger.info(f"Loading document from URL: {url}")
-        loader = PlaywrightURLLoader(
-            urls=[url], 
-            remove_selectors=["header", "footer"]
-        )
-        docs = loader.load()
-        logger.info(f"Successfully loaded document from URL: {url}")
-        return docs
-    except Exception as e:
-        logger.error(f"Error loading document from {url}: {e}")
-        return []
-
-def load_and_index_documents(docs, db_file=DB_FILE, table=TABLE_NAME):
+        docs_by_url, stats = asyncio.run(load_pages(urls, cache, max_pages=CRAWLER_MAX_PAGES,
+                                                    per_host=CRAWLER_PER_HOST, timeout=CRAWLER_TIMEOUT))
+    finally:
+        cache.close()
+    logger.info(f"Fetched {len(urls)} URLs: {stats}")
+    return docs_by_url
+
+def open_index(db_file=DB_FILE, table=TABLE_NAME):
+    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    return DocumentIndex(db_file, table, embedding_function, text_splitter)
+
+def load_and_index_documents(db):
+    """Crawl every URL and update the index, embedding only chunks whose content is new."""
     try:
-        logger.info("Splitting documents into chunks...")
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        docs_split = text_splitter.split_documents(docs)
-        texts = [doc.page_content for doc in docs_split]
-        
+        logger.info("Starting document loading...")
+        docs_by_url = load_documents_by_url()
+        if not any(docs_by_url.values()):
+            logger.error("No documents loaded.")
+            return False
+        logger.info(f"Number of documents loaded: {sum(len(docs) for docs in docs_by_url.values())}")
+
         logger.info("Indexing documents...")
-        embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        db = SQLiteVSS.from_texts(
-            texts=texts,
-            embedding=embedding_function,
-            table=table,
-            db_file=db_file,
-        )
-        logger.info("Documents indexed successfully.")
-        return db
+        stats = db.update(docs_by_url)
+        logger.info(f"Index up to date: {stats}. Embedding cache: {embedding_cache.snapshot()}")
+        return True
     except Exception as e:
         logger.error(f"Error indexing documents: {e}")
-        return None
+        return False
 
 def query_documents(db, query):
     try:
@@ -121,6 +155,7 @@ def query_documents(db, query):
 def loop_chat(db):
     model = MODEL_NAME
     messages = []
+    window = ContextWindow(CONTEXT_TOKENS, summarize=lambda prompt: client.generate(model=model, prompt=prompt)['response'])
 
     while True:
         user_input = input("\nYou: ")  # Ensuring "You: " starts on a new line
@@ -133,33 +168,26 @@ def loop_chat(db):
         
         context = query_documents(db, user_input)
 
-        full_response = stream_chat_response_with_context(model, messages, context)
+        full_response = stream_chat_response_with_context(model, messages, context, window)
         messages.append({'role': 'assistant', 'content': full_response})
 
 if __name__ == "__main__":
     try:
         validate_config()
-
-        logger.info("Starting document loading...")
-        # Load documents from the specified URLs
-        loop = asyncio.get_event_loop()
-        docs = loop.run_until_complete(load_documents_from_urls(URLS))
-
-        # Flatten list of lists
-        docs = [doc for sublist in docs for doc in sublist]
-
-        if docs:
-            logger.info(f"Number of documents loaded: {len(docs)}")
-
-            # Index the loaded documents
-            db = load_and_index_documents(docs)
-
-            if db:
-                # Start the interactive loop chat
-                loop_chat(db)
-            else:
-                logger.error("Failed to index documents.")
+        db = open_index()
+
+        if WARM_START and db.indexed_urls():
+            # Serve from the index built by an earlier run right away and
+            # re-crawl the sources in the background.
+            logger.info(f"Warm start from {DB_FILE}; refreshing sources in the background")
+            start_refresher(db, open_index, load_documents_by_url, REFRESH_INTERVAL)
+            loop_chat(db)
+        elif load_and_index_documents(db):
+            if REFRESH_INTERVAL > 0:
+                start_refresher(db, open_index, load_documents_by_url, REFRESH_INTERVAL, delay=REFRESH_INTERVAL)
+            # Start the interactive loop chat
+            loop_chat(db)
         else:
-            logger.error("No documents loaded.")
+            logger.error("Failed to index documents.")
     except Exception as e:
         logger.error(f"An error occurred: {e}")
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import suppress
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCES = ('image', 'font', 'media')
+# Static HTML with less text than this, or with an empty single-page-app root,
+# is assumed to be filled in by JavaScript and is rendered in the browser.
+MIN_STATIC_CHARS = 200
+APP_SHELL = re.compile(r'<div id="(?:root|app|__next|__nuxt)"[^>]*>\s*</div>|enable javascript', re.IGNORECASE)
+BLOCK_TAGS = ('p', 'div', 'section', 'article', 'main', 'aside', 'nav', 'li', 'dt', 'dd', 'tr', 'pre', 'blockquote',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr', 'table', 'ul', 'ol')
+
+
+def extract_text(html, remove_selectors=('header', 'footer')):
+    """Return the visible text of a page, one line per block element.
+
+    Scripts, styles and the given selectors are removed first.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup.select(', '.join(('script', 'style', 'noscript', 'template', *remove_selectors))):
+        element.decompose()
+    for element in soup.find_all(BLOCK_TAGS):
+        element.insert_before('\n')
+        element.insert_after('\n')
+    lines = (' '.join(line.split()) for line in (soup.body or soup).get_text().splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+class Crawler:
+    """Render pages with one shared Chromium and a bounded pool of reusable pages.
+
+    At most ``max_pages`` pages load at once, each in its own browser context,
+    and at most ``per_host`` of them against the same host. Images, fonts and
+    media are never downloaded. Each page gets ``timeout`` seconds to load.
+    Use it as an async context manager:
+
+        async with Crawler() as crawler:
+            docs_by_url = await crawler.crawl(urls)
+    """
+
+    def __init__(self, max_pages=8, per_host=2, timeout=30.0, remove_selectors=('header', 'footer'),
+                 blocked_resources=BLOCKED_RESOURCES):
+        self.max_pages = max_pages
+        self.per_host = per_host
+        self.timeout = timeout
+        self.remove_selectors = remove_selectors
+        self.blocked_resources = set(blocked_resources)
+        self.hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self.stats = {'pages': 0, 'failures': 0, 'blocked_requests': 0, 'seconds': 0.0}
+
+    async def __aenter__(self):
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch()
+        self.pages = asyncio.Queue()
+        for _ in range(self.max_pages):
+            context = await self.browser.new_context()
+            await context.route('**/*', self._route)
+            await self.pages.put(await context.new_page())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.browser.close()
+        await self.playwright.stop()
+
+    async def fetch(self, url):
+        """Load url and return its text as a one-Document list, or [] if it failed."""
+        async with self.hosts[urlsplit(url).netloc]:
+            page = await self.pages.get()
+            try:
+                response = await page.goto(url, wait_until='domcontentloaded', timeout=self.timeout * 1000)
+                if response is not None and not response.ok:
+                    raise RuntimeError(f"HTTP {response.status}")
+                text = extract_text(await page.content(), self.remove_selectors)
+                self.stats['pages'] += 1
+                return [Document(page_content=text, metadata={'source': url})]
+            except Exception as e:
+                logger.error(f"Error loading document from {url}: {e}")
+                self.stats['failures'] += 1
+                # Leave the failed navigation behind so the page is clean for the next URL.
+                with suppress(Exception):
+                    await page.goto('about:blank')
+                return []
+            finally:
+                self.pages.put_nowait(page)
+
+    async def crawl(self, urls):
+        """Fetch every URL concurrently and return {url: [Document]} in the order given."""
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.fetch(url) for url in urls))
+        self.stats['seconds'] += time.perf_counter() - start
+        return dict(zip(urls, results))
+
+    def pages_per_minute(self):
+        return self.stats['pages'] * 60 / self.stats['seconds'] if self.stats['seconds'] else 0.0
+
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked_resources:
+            self.stats['blocked_requests'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+async def crawl(urls, **kwargs):
+    """Crawl urls with a temporary Crawler; returns ({url: [Document]}, stats)."""
+    async with Crawler(**kwargs) as crawler:
+        docs_by_url = await crawler.crawl(urls)
+    stats = dict(crawler.stats, pages_per_minute=round(crawler.pages_per_minute(), 1))
+    return docs_by_url, stats
+
+def needs_rendering(html, text):
+    return len(text) < MIN_STATIC_CHARS or APP_SHELL.search(html) is not None
+
+async def load_pages(urls, cache, max_pages=8, per_host=2, timeout=30.0, remove_selectors=('header', 'footer')):
+    """Load urls cheaply through a FetchCache; returns ({url: [Document]}, stats).
+
+    Every URL is first fetched with a plain conditional GET. A 304, or a body
+    identical to the cached one, reuses the cached text. Static pages are
+    extracted from the HTML directly. Only pages that need JavaScript go
+    through the browser, and Chromium is not started at all when no page
+    does.
+    """
+    stats = {'not_modified': 0, 'unchanged': 0, 'static': 0, 'rendered': 0, 'failures': 0}
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+    docs_by_url = {}
+    to_render = {}
+
+    def document(url, text):
+        return [Document(page_content=text, metadata={'source': url})]
+
+    async def fetch(client, url):
+        entry = cache.get(url)
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            async with hosts[urlsplit(url).netloc]:
+                response = await client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.error(f"Error loading document from {url}: {e}")
+            stats['failures'] += 1
+            docs_by_url[url] = []
+            return
+
+        if response.status_code == 304 and entry:
+            stats['not_modified'] += 1
+            docs_by_url[url] = document(url, entry['text'])
+            return
+        if response.status_code != 200:
+            logger.error(f"Error loading document from {url}: HTTP {response.status_code}")
+            stats['failures'] += 1
+            docs_by_url[url] = []
+            return
+
+        validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                      hashlib.sha256(response.content).hexdigest())
+        if entry and entry['body_hash'] == validators[2]:
+            # Same bytes as last time (the server just does not send validators).
+            stats['unchanged'] += 1
+            cache.put(url, *validators, entry['text'], entry['rendered'])
+            docs_by_url[url] = document(url, entry['text'])
+            return
+        html = response.text
+        text = extract_text(html, remove_selectors)
+        if (entry and entry['rendered']) or needs_rendering(html, text):
+            to_render[url] = validators
+            return
+        stats['static'] += 1
+        cache.put(url, *validators, text, False)
+        docs_by_url[url] = document(url, text)
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as client:
+        await asyncio.gather(*(fetch(client, url) for url in urls))
+
+    if to_render:
+        try:
+            rendered, crawl_stats = await crawl(list(to_render), max_pages=max_pages, per_host=per_host,
+                                                timeout=timeout, remove_selectors=remove_selectors)
+        except Exception as e:
+            logger.error(f"Browser crawl failed: {e}")
+            rendered, crawl_stats = {url: [] for url in to_render}, {'failures': len(to_render), 'pages': 0,
+                                                                       'pages_per_minute': 0.0}
+        stats['failures'] += crawl_stats['failures']
+        stats['rendered'] += crawl_stats['pages']
+        stats['pages_per_minute'] = crawl_stats['pages_per_minute']
+        for url, docs in rendered.items():
+            if docs:
+                cache.put(url, *to_render[url], docs[0].page_content, True)
+            docs_by_url[url] = docs
+    return {url: docs_by_url[url] for url in urls}, stats
@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from langchain_community.vectorstores import SQLiteVSS
+
+from embedding_cache import text_hash
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentIndex:
+    """A SQLiteVSS table kept in step with its source URLs by content hashes.
+
+    Two manifest tables sit next to the vector table: ``{table}_sources`` holds
+    one hash per URL over its whole text, and ``{table}_chunks`` maps each
+    chunk hash of a URL to its row in the vector table. update() skips URLs
+    whose text is unchanged. For changed URLs it embeds only chunks that are
+    not indexed yet and deletes chunks that disappeared. URLs no longer listed
+    are dropped entirely.
+
+    sqlite-vss keeps each connection's vector index in memory, so changes
+    written through another connection are only seen after reconnecting;
+    mark_stale() makes the next search do that.
+    """
+
+    def __init__(self, db_file, table, embedding, text_splitter):
+        self.db_file = db_file
+        self.table = table
+        self.embedding = embedding
+        self.text_splitter = text_splitter
+        self.stale = False
+        self._connect()
+        self.connection.execute(f'''CREATE TABLE IF NOT EXISTS {table}_sources (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            indexed_at REAL NOT NULL
+        )''')
+        self.connection.execute(f'''CREATE TABLE IF NOT EXISTS {table}_chunks (
+            url TEXT NOT NULL,
+            chunk_hash TEXT NOT NULL,
+            row_id INTEGER NOT NULL
+        )''')
+        self.connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_chunks_url ON {table}_chunks(url)')
+        self.connection.commit()
+        self._drop_unmanaged_rows()
+
+    def similarity_search(self, query, k=4):
+        if self.stale:
+            self.stale = False
+            self.connection.close()
+            self._connect()
+        return self.store.similarity_search(query, k=k)
+
+    def mark_stale(self):
+        """Reconnect before the next search; safe to call from any thread."""
+        self.stale = True
+
+    def indexed_urls(self):
+        return [url for url, in self.connection.execute(f'SELECT url FROM {self.table}_sources')]
+
+    def update(self, docs_by_url):
+        """Bring the index in line with docs_by_url ({url: [Document, ...]}) and return counts.
+
+        A URL that maps to an empty list (it failed to load) keeps its
+        existing chunks; a URL missing from the mapping is removed.
+        """
+        stats = {'unchanged': 0, 'updated': 0, 'removed_urls': 0, 'added_chunks': 0, 'removed_chunks': 0}
+        known = dict(self.connection.execute(f'SELECT url, content_hash FROM {self.table}_sources').fetchall())
+
+        for url in set(known) - set(docs_by_url):
+            stats['removed_chunks'] += self._delete_rows(self._rows_for(url))
+            self.connection.execute(f'DELETE FROM {self.table}_sources WHERE url = ?', (url,))
+            stats['removed_urls'] += 1
+            logger.info(f"Removed {url} from the index")
+
+        for url, docs in docs_by_url.items():
+            if not docs:
+                continue
+            content_hash = text_hash('\n'.join(doc.page_content for doc in docs))
+            if known.get(url) == content_hash:
+                stats['unchanged'] += 1
+                continue
+            added, removed = self._update_url(url, docs)
+            self.connection.execute(f'INSERT OR REPLACE INTO {self.table}_sources (url, content_hash, indexed_at) '
+                                    'VALUES (?, ?, ?)', (url, content_hash, time.time()))
+            stats['updated'] += 1
+            stats['added_chunks'] += added
+            stats['removed_chunks'] += removed
+            logger.info(f"Re-indexed {url}: {added} new chunks, {removed} removed")
+
+        self.connection.commit()
+        return stats
+
+    def close(self):
+        self.connection.close()
+
+    def _connect(self):
+        self.connection = SQLiteVSS.create_connection(self.db_file)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.store = SQLiteVSS(table=self.table, connection=self.connection, embedding=self.embedding,
+                               db_file=self.db_file)
+
+    def _update_url(self, url, docs):
+        chunks = self.text_splitter.split_documents(docs)
+        existing = defaultdict(list)
+        for chunk_hash, row_id in self.connection.execute(
+                f'SELECT chunk_hash, row_id FROM {self.table}_chunks WHERE url = ?', (url,)):
+            existing[chunk_hash].append(row_id)
+
+        # Chunks already in the index are kept as they are. Duplicate chunks
+        # are matched one for one.
+        new_chunks = []
+        for chunk in chunks:
+            rows = existing.get(text_hash(chunk.page_content))
+            if rows:
+                rows.pop()
+            else:
+                new_chunks.append(chunk)
+        stale = [row_id for rows in existing.values() for row_id in rows]
+
+        if new_chunks:
+            row_ids = self.store.add_texts([chunk.page_content for chunk in new_chunks],
+                                           metadatas=[chunk.metadata for chunk in new_chunks])
+            self.connection.executemany(
+                f'INSERT INTO {self.table}_chunks (url, chunk_hash, row_id) VALUES (?, ?, ?)',
+                [(url, text_hash(chunk.page_content), row_id) for chunk, row_id in zip(new_chunks, row_ids)])
+        return len(new_chunks), self._delete_rows(stale)
+
+    def _rows_for(self, url):
+        return [row_id for row_id, in self.connection.execute(
+            f'SELECT row_id FROM {self.table}_chunks WHERE url = ?', (url,))]
+
+    def _delete_rows(self, row_ids):
+        # SQLiteVSS only mirrors inserts into vss_{table}, so deletes go to both tables.
+        params = [(row_id,) for row_id in row_ids]
+        self.connection.executemany(f'DELETE FROM {self.table} WHERE rowid = ?', params)
+        self.connection.executemany(f'DELETE FROM vss_{self.table} WHERE rowid = ?', params)
+        self.connection.executemany(f'DELETE FROM {self.table}_chunks WHERE row_id = ?', params)
+        return len(params)
+
+    def _drop_unmanaged_rows(self):
+        """Clear rows written without a manifest (by SQLiteVSS.from_texts) so they are not duplicated."""
+        manifest_rows = self.connection.execute(f'SELECT COUNT(*) FROM {self.table}_chunks').fetchone()[0]
+        table_rows = self.connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        if table_rows and not manifest_rows:
+            logger.info(f"Rebuilding {self.table}: {table_rows} rows were indexed without a manifest")
+            self.connection.execute(f'DELETE FROM {self.table}')
+            self.connection.execute(f'DELETE FROM vss_{self.table}')
+            self.connection.commit()
+
+
+def start_refresher(index, open_index, load_documents, interval, delay=0.0):
+    """Keep index fresh from a background thread and return the thread.
+
+    The thread opens its own DocumentIndex with open_index(), so its writes
+    go through a separate connection while the caller keeps querying index
+    (the database is in WAL mode); index is marked stale after every refresh
+    that changed something. load_documents() returns {url: [Document, ...]}.
+    The first refresh runs after ``delay`` seconds, then one runs every
+    ``interval`` seconds; with an interval of 0 it refreshes only once.
+    """
+    def run():
+        time.sleep(delay)
+        writer = open_index()
+        while True:
+            try:
+                stats = writer.update(load_documents())
+                logger.info(f"Background index refresh finished: {stats}")
+                if stats['updated'] or stats['removed_urls']:
+                    index.mark_stale()
+            except Exception as e:
+                logger.error(f"Background index refresh failed: {e}")
+            if interval <= 0:
+                break
+            time.sleep(interval)
+        writer.close()
+
+    thread = threading.Thread(target=run, name='index-refresh', daemon=True)
+    thread.start()
+    return thread
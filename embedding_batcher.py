@@ -0,0 +1,88 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into batched upstream calls.
+
+    Single prompts submitted within ``window`` seconds of each other (and for
+    the same model, options and keep_alive) are sent upstream as one batch of
+    at most ``max_batch`` inputs. At most ``max_concurrency`` batches are in
+    flight against the backend at any time. If a coalesced batch fails, its
+    prompts are retried one at a time so each caller gets its own result.
+
+    ``send(model, inputs, options, keep_alive)`` performs the upstream call and
+    returns one vector per input.
+    """
+
+    def __init__(self, send, window=0.01, max_batch=64, max_concurrency=4):
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='embed')
+        self.pending = queue.Queue()
+        threading.Thread(target=self._collect, name='embed-batcher', daemon=True).start()
+
+    def submit(self, model, prompt, options=None, keep_alive=None):
+        """Queue one prompt and return a Future resolving to its vector."""
+        future = Future()
+        self.pending.put(((model, json.dumps(options, sort_keys=True), keep_alive), prompt, future))
+        return future
+
+    def embed_many(self, model, prompts, options=None, keep_alive=None):
+        """Embed a list of prompts, split into batches that share the concurrency limit."""
+        key = (model, json.dumps(options, sort_keys=True), keep_alive)
+        futures = [
+            self.executor.submit(self._send, key, prompts[start:start + self.max_batch])
+            for start in range(0, len(prompts), self.max_batch)
+        ]
+        return [vector for future in futures for vector in future.result()]
+
+    def _send(self, key, inputs):
+        model, options, keep_alive = key
+        vectors = self.send(model, inputs, json.loads(options), keep_alive)
+        if len(vectors) != len(inputs):
+            raise ValueError(f"Expected {len(inputs)} embeddings, got {len(vectors)}")
+        return vectors
+
+    def _collect(self):
+        while True:
+            groups = {}
+            item = self.pending.get()
+            deadline = time.monotonic() + self.window
+            while True:
+                key, prompt, future = item
+                group = groups.setdefault(key, [])
+                group.append((prompt, future))
+                if len(group) >= self.max_batch:
+                    self.executor.submit(self._dispatch, key, groups.pop(key))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            for key, group in groups.items():
+                self.executor.submit(self._dispatch, key, group)
+
+    def _dispatch(self, key, group):
+        try:
+            vectors = self._send(key, [prompt for prompt, _ in group])
+        except Exception as e:
+            if len(group) == 1:
+                group[0][1].set_exception(e)
+                return
+            # The batch mixes prompts from different callers; retry them one
+            # by one so a bad input only fails its own request.
+            for prompt, future in group:
+                try:
+                    future.set_result(self._send(key, [prompt])[0])
+                except Exception as e:
+                    future.set_exception(e)
+        else:
+            for (_, future), vector in zip(group, vectors):
+                future.set_result(vector)
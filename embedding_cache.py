@@ -0,0 +1,148 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Normalise text so trivially different copies of a chunk share a cache key."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, normalised text hash).
+
+    Vectors live in SQLite so they survive restarts and can be shared between
+    processes (the API gateway and the indexing scripts), with an in-memory LRU
+    tier in front of it. When the on-disk vectors exceed ``max_bytes`` the
+    least recently used rows are evicted.
+    """
+
+    def __init__(self, db_file='embedding_cache.db', memory_items=10000, max_bytes=1024 ** 3):
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS embeddings (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (model, text_hash)
+        )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)')
+        self.conn.commit()
+        self.disk_bytes = self.conn.execute('SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings').fetchone()[0]
+
+    def get_many(self, model, texts):
+        """Return cached vectors for texts, with None for every miss."""
+        keys = [(model, text_hash(text)) for text in texts]
+        results = [None] * len(keys)
+        with self.lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[i] = self.memory[key]
+                    self.stats['memory_hits'] += 1
+                else:
+                    missing.setdefault(key[1], []).append(i)
+
+            if missing:
+                hashes = list(missing)
+                rows = []
+                for start in range(0, len(hashes), 500):
+                    part = hashes[start:start + 500]
+                    rows += self.conn.execute(
+                        f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({",".join("?" * len(part))})',
+                        [model, *part]).fetchall()
+                for digest, blob in rows:
+                    vector = array('d', blob).tolist()
+                    self._remember((model, digest), vector)
+                    for i in missing.pop(digest):
+                        results[i] = vector
+                        self.stats['disk_hits'] += 1
+                if rows:
+                    self.conn.executemany('UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?',
+                                          [(time.time(), model, digest) for digest, _ in rows])
+                    self.conn.commit()
+                self.stats['misses'] += sum(len(indexes) for indexes in missing.values())
+        return results
+
+    def get(self, model, text):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = []
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, text_hash(text))
+                self._remember(key, vector)
+                rows.append((model, key[1], array('d', vector).tobytes(), now))
+            self.conn.executemany('INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)', rows)
+            self.disk_bytes += sum(len(row[2]) for row in rows)
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def put(self, model, text, vector):
+        self.put_many(model, [text], [vector])
+
+    def embed(self, model, texts, compute):
+        """Return vectors for texts, calling compute(missing_texts) only for cache misses."""
+        if not all(isinstance(text, str) for text in texts):
+            raise TypeError("Embedding inputs must be strings")
+        vectors = self.get_many(model, texts)
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(text_hash(texts[i]), []).append(i)
+        if missing:
+            unique = [texts[indexes[0]] for indexes in missing.values()]
+            computed = compute(unique)
+            self.put_many(model, unique, computed)
+            for indexes, vector in zip(missing.values(), computed):
+                for i in indexes:
+                    vectors[i] = vector
+        return vectors
+
+    def snapshot(self):
+        """Return hit/miss counters and current tier sizes."""
+        with self.lock:
+            return dict(self.stats, memory_items=len(self.memory), disk_bytes=self.disk_bytes)
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        # Recount first: INSERT OR REPLACE of an existing key over-counts disk_bytes.
+        self.disk_bytes = self.conn.execute('SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings').fetchone()[0]
+        target = self.max_bytes * 0.9
+        while self.disk_bytes > target:
+            rows = self.conn.execute('SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 1000').fetchall()
+            if not rows:
+                break
+            for model, digest, size in rows:
+                self.memory.pop((model, digest), None)
+                self.disk_bytes -= size
+                self.stats['evictions'] += 1
+                if self.disk_bytes <= target:
+                    rows = rows[:rows.index((model, digest, size)) + 1]
+                    break
+            self.conn.executemany('DELETE FROM embeddings WHERE model = ? AND text_hash = ?',
+                                  [(model, digest) for model, digest, _ in rows])
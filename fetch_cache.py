@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+
+class FetchCache:
+    """HTTP validators and cleaned text of fetched pages, kept in SQLite.
+
+    Each URL stores the ETag and Last-Modified of its last 200 response, a
+    hash of the raw body, the extracted text, and whether that text had to be
+    rendered in a browser. A later fetch can then ask the server whether
+    anything changed, and reuse the text when it did not.
+    """
+
+    def __init__(self, db_file='fetch_cache.db'):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT NOT NULL,
+            text TEXT NOT NULL,
+            rendered INTEGER NOT NULL,
+            fetched_at REAL NOT NULL
+        )''')
+        self.conn.commit()
+
+    def get(self, url):
+        """Return the cached entry for url as a dict, or None."""
+        row = self.conn.execute('SELECT etag, last_modified, body_hash, text, rendered FROM pages WHERE url = ?',
+                                (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body_hash, text, rendered = row
+        return {'etag': etag, 'last_modified': last_modified, 'body_hash': body_hash, 'text': text,
+                'rendered': bool(rendered)}
+
+    def put(self, url, etag, last_modified, body_hash, text, rendered):
+        self.conn.execute('INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, text, rendered, fetched_at) '
+                          'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (url, etag, last_modified, body_hash, text, int(rendered), time.time()))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
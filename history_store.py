@@ -0,0 +1,191 @@
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_type TEXT NOT NULL,
+    content TEXT NOT NULL
+)'''
+
+# External-content FTS5 index over messages.content, kept in sync by triggers so
+# every write path (including other processes) updates it incrementally.
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+INSERT INTO messages_fts(messages_fts) VALUES ('rebuild');
+'''
+
+INSERT_MESSAGE = 'INSERT INTO messages (message_type, content) VALUES (?, ?)'
+DELETE_LAST_MESSAGE = 'DELETE FROM messages WHERE id = (SELECT MAX(id) FROM messages)'
+
+
+def connect(db_file, **kwargs):
+    conn = sqlite3.connect(db_file, **kwargs)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class HistoryStore:
+    """Chat history in SQLite, written by a single background thread.
+
+    Messages are indexed for full-text search with FTS5 (maintained by
+    triggers), falling back to LIKE scans when SQLite lacks FTS5.
+
+    Writes are queued and applied in submission order. Everything already
+    queued when the writer wakes up is committed in one transaction, with runs
+    of inserts sent as one executemany on a reused prepared statement.
+    flush() waits for queued writes, and close() flushes before stopping the
+    writer.
+    """
+
+    def __init__(self, db_file, batch_size=500):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        with closing(connect(db_file)) as conn:
+            conn.execute(SCHEMA)
+            self.fts = True
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone():
+                try:
+                    conn.executescript(FTS_SCHEMA)
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Full-text search unavailable, falling back to LIKE: {e}")
+                    self.fts = False
+            conn.commit()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self.writer.start()
+
+    def add_message(self, message_type, content):
+        self.queue.put(('insert', (message_type, content)))
+
+    def delete_last_message(self, on_done=None):
+        """Delete the newest message once pending inserts are written; on_done runs on the writer thread."""
+        self.queue.put(('delete_last', on_done))
+
+    def fetch_page(self, before_id=None, limit=100):
+        """Return up to limit messages older than before_id (newest page when None), oldest first.
+
+        Pages are addressed by id (the rowid primary key), so each page is an
+        index range scan regardless of how much history precedes it.
+        """
+        with closing(connect(self.db_file)) as conn:
+            if before_id is None:
+                rows = conn.execute('SELECT id, message_type, content FROM messages ORDER BY id DESC LIMIT ?',
+                                    (limit,)).fetchall()
+            else:
+                rows = conn.execute('SELECT id, message_type, content FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?',
+                                    (before_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def search(self, query, limit=50, candidates=2000):
+        """Return (id, message_type, snippet) for the best matches of query, best first.
+
+        Every word in the query must match, and the last one also matches as a
+        prefix, so results appear while the user is still typing. Only the
+        newest ``candidates`` matches are ranked by bm25, which keeps queries for
+        very common words fast on large histories.
+        """
+        words = re.findall(r'\w+', query)
+        if not words:
+            return []
+        with closing(connect(self.db_file)) as conn:
+            if not self.fts:
+                pattern = f"%{query.strip()}%"
+                return conn.execute('SELECT id, message_type, substr(content, 1, 120) FROM messages '
+                                    'WHERE content LIKE ? ORDER BY id DESC LIMIT ?', (pattern, limit)).fetchall()
+            match = ' '.join(f'"{word}"' for word in words) + '*'
+            return conn.execute(
+                "SELECT m.id, m.message_type, snippet(messages_fts, 0, '[', ']', '…', 12) "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "WHERE messages_fts MATCH :match AND messages_fts.rowid >= ("
+                "    SELECT MIN(rowid) FROM (SELECT rowid FROM messages_fts WHERE messages_fts MATCH :match"
+                "                            ORDER BY rowid DESC LIMIT :candidates)) "
+                "ORDER BY rank LIMIT :limit",
+                {'match': match, 'candidates': candidates, 'limit': limit}).fetchall()
+
+    def flush(self):
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        done.wait()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(('stop', None))
+            self.writer.join()
+
+    def _run(self):
+        conn = connect(self.db_file)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Control ops are collected up front so that a failed write cannot
+            # keep flush() or close() waiting.
+            callbacks = []
+            for op, arg in batch:
+                if op == 'delete_last' and arg:
+                    callbacks.append(arg)
+                elif op == 'flush':
+                    callbacks.append(arg.set)
+                elif op == 'stop':
+                    running = False
+
+            try:
+                self._write(conn, batch)
+            finally:
+                for callback in callbacks:
+                    callback()
+        conn.close()
+
+    def _write(self, conn, batch):
+        """Apply a batch in one transaction; if it fails, retry each op on its own."""
+        inserts = []
+        try:
+            with conn:
+                for op, arg in batch:
+                    if op == 'insert':
+                        inserts.append(arg)
+                        continue
+                    if inserts:
+                        conn.executemany(INSERT_MESSAGE, inserts)
+                        inserts = []
+                    if op == 'delete_last':
+                        conn.execute(DELETE_LAST_MESSAGE)
+                if inserts:
+                    conn.executemany(INSERT_MESSAGE, inserts)
+            return
+        except Exception as e:
+            logger.warning(f"History batch of {len(batch)} operations failed, retrying one by one: {e}")
+
+        # Only the ops that fail on their own are lost.
+        for op, arg in batch:
+            try:
+                with conn:
+                    if op == 'insert':
+                        conn.execute(INSERT_MESSAGE, arg)
+                    elif op == 'delete_last':
+                        conn.execute(DELETE_LAST_MESSAGE)
+            except Exception as e:
+                logger.error(f"Error writing history operation {op} {arg!r}: {e}")
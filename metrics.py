@@ -0,0 +1,43 @@
+import json
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Generations take seconds to minutes, so the default buckets are too fine.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REQUESTS = Counter('gateway_requests_total', 'Requests handled by the gateway', ['route', 'status'])
+ERRORS = Counter('gateway_errors_total', 'Failed requests', ['route', 'kind'])
+IN_FLIGHT = Gauge('gateway_in_flight_requests', 'Requests currently being served', ['route'])
+QUEUE_WAIT = Histogram('gateway_queue_wait_seconds', 'Time spent waiting for a scheduler slot', ['model'],
+                       buckets=LATENCY_BUCKETS)
+UPSTREAM_CONNECT = Histogram('gateway_upstream_connect_seconds', 'Time until Ollama returned response headers',
+                             ['path'], buckets=LATENCY_BUCKETS)
+TTFT = Histogram('gateway_time_to_first_token_seconds', 'Time until the first chunk was sent to the client',
+                 ['route', 'model'], buckets=LATENCY_BUCKETS)
+DURATION = Histogram('gateway_request_duration_seconds', 'Total time until the response was fully sent',
+                     ['route', 'model'], buckets=LATENCY_BUCKETS)
+TOKENS = Counter('gateway_generated_tokens_total', 'Tokens generated, from Ollama eval_count', ['model'])
+TOKENS_PER_SECOND = Histogram('gateway_tokens_per_second', 'Generation speed from eval_count / eval_duration',
+                              ['model'], buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500))
+
+
+def final_stats(chunk):
+    """Return the parsed final NDJSON object if chunk carries Ollama's timing fields, else None.
+
+    Only the last line of a generation contains "done":true, so the other
+    lines are never decoded.
+    """
+    if b'"done":true' not in chunk and b'"done": true' not in chunk:
+        return None
+    try:
+        body = json.loads(chunk)
+    except ValueError:
+        return None
+    return body if 'eval_count' in body else None
+
+def observe_generation(model, stats):
+    count = stats.get('eval_count', 0)
+    TOKENS.labels(model).inc(count)
+    duration = stats.get('eval_duration', 0)
+    if count and duration:
+        TOKENS_PER_SECOND.labels(model).observe(count / (duration / 1e9))
@@ -0,0 +1,96 @@
+import hashlib
+import logging
+import threading
+import time
+
+from backend_pool import model_tag
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogEntry:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        self.fetched_at = time.monotonic()
+        self.accessed_at = self.fetched_at
+
+
+class ModelCatalog:
+    """TTL cache for the /api/tags listing and per-model /api/show details.
+
+    ``fetch_tags()`` and ``fetch_show(name)`` return ``(status, body_bytes)``.
+    Only successful responses are cached. A background thread refreshes the
+    listing and every recently used /show entry every ``refresh_interval``
+    seconds, so readers get a cached copy without waiting on Ollama. Calls that
+    change the set of models use invalidate() to drop stale entries.
+    """
+
+    def __init__(self, fetch_tags, fetch_show, ttl=60.0, refresh_interval=15.0):
+        self.fetch_tags = fetch_tags
+        self.fetch_show = fetch_show
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.listing = None
+        self.details = {}
+
+    def start(self):
+        threading.Thread(target=self._refresh_loop, name='model-catalog', daemon=True).start()
+
+    def tags(self):
+        with self.lock:
+            entry = self.listing
+        if entry is None or self._expired(entry):
+            entry = self._load_tags()
+        entry.accessed_at = time.monotonic()
+        return entry
+
+    def show(self, name):
+        key = model_tag(name)
+        with self.lock:
+            entry = self.details.get(key)
+        if entry is None or self._expired(entry):
+            entry = self._load_show(key, name)
+        entry.accessed_at = time.monotonic()
+        return entry
+
+    def invalidate(self, *names):
+        """Drop the listing and the details of the given models."""
+        with self.lock:
+            self.listing = None
+            for name in names:
+                if name:
+                    self.details.pop(model_tag(name), None)
+
+    def _expired(self, entry):
+        return time.monotonic() - entry.fetched_at > self.ttl
+
+    def _load_tags(self):
+        entry = CatalogEntry(*self.fetch_tags())
+        if entry.status == 200:
+            with self.lock:
+                self.listing = entry
+        return entry
+
+    def _load_show(self, key, name):
+        entry = CatalogEntry(*self.fetch_show(name))
+        if entry.status == 200:
+            with self.lock:
+                self.details[key] = entry
+        return entry
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self._load_tags()
+                with self.lock:
+                    recent = [key for key, entry in self.details.items()
+                              if time.monotonic() - entry.accessed_at < self.ttl]
+                    self.details = {key: self.details[key] for key in recent}
+                for key in recent:
+                    self._load_show(key, key)
+            except Exception as e:
+                logger.warning(f"Model catalog refresh failed: {e}")
+            time.sleep(self.refresh_interval)
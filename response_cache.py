@@ -0,0 +1,74 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Fields that change how a response is delivered, not what it contains.
+DELIVERY_FIELDS = ('stream', 'keep_alive')
+
+
+def is_deterministic(payload):
+    """True when the request pins sampling, so repeating it yields the same output."""
+    options = payload.get('options') or {}
+    return options.get('temperature') == 0 or options.get('seed') is not None
+
+def response_key(path, payload, model_digest):
+    """Hash the canonicalised payload together with the digest of the model weights."""
+    canonical = {key: value for key, value in payload.items() if key not in DELIVERY_FIELDS and value is not None}
+    canonical['model_digest'] = model_digest
+    blob = json.dumps([path, canonical], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def replay(lines, stream):
+    """Turn cached NDJSON lines back into a streamed line list or a single JSON object.
+
+    Entries recorded from a non-streamed call hold a single, final object, which
+    is also a valid one-chunk stream. Entries recorded from a stream are folded
+    into one object the same way Ollama does when stream is false.
+    """
+    if stream:
+        return lines
+    chunks = [json.loads(line) for line in lines]
+    if len(chunks) == 1:
+        return chunks[0]
+    final = dict(chunks[-1])
+    if 'message' in final:
+        content = ''.join(chunk.get('message', {}).get('content', '') for chunk in chunks)
+        final['message'] = dict(final['message'], content=content)
+    else:
+        final['response'] = ''.join(chunk.get('response', '') for chunk in chunks)
+    return final
+
+
+class ResponseCache:
+    """In-memory LRU of completed responses, stored as NDJSON lines, with a TTL."""
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, lines):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, list(lines))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
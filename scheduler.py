@@ -0,0 +1,116 @@
+import itertools
+import math
+import threading
+import time
+
+from backend_pool import model_tag
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+
+
+class QueueFull(Exception):
+    """Raised when a request cannot be queued; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Generation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, model, priority, seq):
+        self.model = model
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.granted = threading.Event()
+
+
+class Scheduler:
+    """Admission control and ordering for generation requests.
+
+    At most ``max_concurrency`` generations run at once, and at most
+    ``model_limits.get(model, model_concurrency)`` per model. Requests over
+    that wait in a queue of at most ``max_queue`` entries; beyond it
+    acquire() raises QueueFull. Free slots go to interactive requests before
+    batch ones. Within a priority class, requests for a model that is already
+    running (or finished most recently) are served first, which keeps Ollama
+    from swapping models back and forth. A request that has waited ``group_wait`` seconds is served
+    in arrival order regardless, so other models are not starved.
+    """
+
+    def __init__(self, max_concurrency=4, model_concurrency=2, model_limits=None, max_queue=100,
+                 group_wait=2.0, queue_timeout=300.0):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.model_limits = {model_tag(name): limit for name, limit in (model_limits or {}).items()}
+        self.max_queue = max_queue
+        self.group_wait = group_wait
+        self.queue_timeout = queue_timeout
+        self.lock = threading.Lock()
+        self.seq = itertools.count()
+        self.waiting = []
+        self.running = {}
+        self.total_running = 0
+        self.last_model = None
+        self.service_time = 10.0
+
+    def acquire(self, model, priority='interactive'):
+        """Block until the request may run and return its Ticket."""
+        ticket = Ticket(model_tag(model), PRIORITIES.get(priority, PRIORITIES['interactive']), next(self.seq))
+        with self.lock:
+            if len(self.waiting) >= self.max_queue:
+                raise QueueFull(self._retry_after())
+            self.waiting.append(ticket)
+            self._dispatch()
+        if not ticket.granted.wait(self.queue_timeout):
+            with self.lock:
+                if not ticket.granted.is_set():
+                    self.waiting.remove(ticket)
+                    raise QueueFull(self._retry_after())
+        return ticket
+
+    def release(self, ticket):
+        with self.lock:
+            self.running[ticket.model] -= 1
+            self.total_running -= 1
+            elapsed = time.monotonic() - ticket.started
+            self.service_time = 0.9 * self.service_time + 0.1 * elapsed
+            self.last_model = ticket.model
+            self._dispatch()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'running': {model: count for model, count in self.running.items() if count},
+                'queued': len(self.waiting),
+                'avg_service_seconds': round(self.service_time, 3),
+            }
+
+    def _limit(self, model):
+        return self.model_limits.get(model, self.model_concurrency)
+
+    def _is_warm(self, model):
+        return self.running.get(model, 0) > 0 or model == self.last_model
+
+    def _retry_after(self):
+        backlog = (len(self.waiting) + self.total_running) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog * self.service_time))
+
+    def _dispatch(self):
+        while self.waiting and self.total_running < self.max_concurrency:
+            eligible = [t for t in self.waiting if self.running.get(t.model, 0) < self._limit(t.model)]
+            if not eligible:
+                return
+            top = min(t.priority for t in eligible)
+            eligible = [t for t in eligible if t.priority == top]
+            oldest = min(eligible, key=lambda t: t.seq)
+            if time.monotonic() - oldest.enqueued >= self.group_wait:
+                ticket = oldest
+            else:
+                ticket = min(eligible, key=lambda t: (not self._is_warm(t.model), t.seq))
+            self.waiting.remove(ticket)
+            self.running[ticket.model] = self.running.get(ticket.model, 0) + 1
+            self.total_running += 1
+            ticket.started = time.monotonic()
+            ticket.granted.set()
@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+
+from backend_pool import model_tag
+
+
+class SessionContexts:
+    """LRU of Ollama ``context`` arrays per (session id, model), with an idle TTL.
+
+    /api/generate returns the tokenised conversation so far in ``context``;
+    sending it back with the next prompt lets Ollama skip re-reading the whole
+    conversation. Contexts are only valid for the model that produced them, so
+    a session that switches models starts over.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id, model):
+        key = (session_id, model_tag(model))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                return None
+            self.entries[key] = (time.monotonic() + self.ttl, entry[1])
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, session_id, model, context):
+        key = (session_id, model_tag(model))
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, context)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_sessions:
+                self.entries.popitem(last=False)
+
+    def snapshot(self):
+        with self.lock:
+            return {'sessions': len(self.entries)}
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionStore:
+    """Server-side chat histories keyed by session id.
+
+    Messages are stored as JSON in SQLite so sessions survive restarts, with
+    an in-memory LRU of recently used histories in front. Each session keeps
+    at most ``max_messages`` messages, dropping the oldest, and sessions idle
+    for more than ``ttl`` seconds are deleted.
+    """
+
+    def __init__(self, db_file='sessions.db', max_messages=200, memory_sessions=1000, ttl=7 * 86400):
+        self.max_messages = max_messages
+        self.memory_sessions = memory_sessions
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'expired': 0}
+        self.next_expiry = 0
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            updated_at REAL NOT NULL
+        )''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS session_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            message TEXT NOT NULL
+        )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_session_messages_session ON session_messages(session_id, id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)')
+        self.conn.commit()
+
+    def history(self, session_id):
+        """Return a copy of the session's messages, oldest first (empty for unknown sessions)."""
+        with self.lock:
+            return list(self._load(session_id))
+
+    def append(self, session_id, messages):
+        now = time.time()
+        with self.lock:
+            history = self._load(session_id, create=True)
+            history.extend(messages)
+            del history[:-self.max_messages]
+            self.conn.execute('INSERT OR REPLACE INTO sessions (id, updated_at) VALUES (?, ?)', (session_id, now))
+            self.conn.executemany('INSERT INTO session_messages (session_id, message) VALUES (?, ?)',
+                                  [(session_id, json.dumps(message)) for message in messages])
+            self.conn.execute('''DELETE FROM session_messages WHERE session_id = ? AND id <= (
+                SELECT id FROM session_messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)''',
+                              (session_id, session_id, self.max_messages))
+            if now >= self.next_expiry:
+                self._expire(now)
+            self.conn.commit()
+
+    def delete(self, session_id):
+        """Forget a session; returns False if it did not exist."""
+        with self.lock:
+            self.memory.pop(session_id, None)
+            deleted = self.conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,)).rowcount
+            self.conn.execute('DELETE FROM session_messages WHERE session_id = ?', (session_id,))
+            self.conn.commit()
+        return bool(deleted)
+
+    def snapshot(self):
+        with self.lock:
+            sessions = self.conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+            return dict(self.stats, sessions=sessions, memory_sessions=len(self.memory))
+
+    def _load(self, session_id, create=False):
+        if session_id in self.memory:
+            self.memory.move_to_end(session_id)
+            self.stats['memory_hits'] += 1
+            return self.memory[session_id]
+        rows = self.conn.execute('SELECT message FROM session_messages WHERE session_id = ? ORDER BY id',
+                                 (session_id,)).fetchall()
+        if rows:
+            self.stats['disk_hits'] += 1
+        elif not create:
+            return []
+        history = [json.loads(message) for message, in rows]
+        self.memory[session_id] = history
+        if len(self.memory) > self.memory_sessions:
+            self.memory.popitem(last=False)
+        return history
+
+    def _expire(self, now):
+        # Runs at most once a minute, piggybacking on writes.
+        self.next_expiry = now + 60
+        expired = [session_id for session_id, in self.conn.execute(
+            'SELECT id FROM sessions WHERE updated_at < ?', (now - self.ttl,)).fetchall()]
+        for session_id in expired:
+            self.memory.pop(session_id, None)
+        self.conn.executemany('DELETE FROM session_messages WHERE session_id = ?', [(s,) for s in expired])
+        self.conn.executemany('DELETE FROM sessions WHERE id = ?', [(s,) for s in expired])
+        self.stats['expired'] += len(expired)
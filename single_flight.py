@@ -0,0 +1,121 @@
+import threading
+
+
+class Call:
+    """One upstream request whose chunks are buffered for every waiter."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.started = False
+        self.done = False
+        self.cancelled = False
+        self.waiters = 0
+        self.on_leave = None
+        self.status = None
+        self.content_type = None
+        self.chunks = []
+        self.error = None
+
+    def wait_started(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.started)
+        if self.error is not None and self.status is None:
+            raise self.error
+
+    def iter_chunks(self):
+        """Yield every chunk from the start, blocking until the upstream produces more.
+
+        Closing the iterator (the client went away) detaches this waiter.
+        """
+        index = 0
+        try:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: index < len(self.chunks) or self.done)
+                    pending = self.chunks[index:]
+                    finished = self.done
+                for chunk in pending:
+                    yield chunk
+                index += len(pending)
+                if finished and index == len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            if self.on_leave:
+                self.on_leave()
+
+
+class SingleFlight:
+    """Collapse identical concurrent requests into one upstream call.
+
+    The first caller for a key starts ``fetch()`` on a background thread;
+    ``fetch`` returns ``(status, content_type, chunks)``. Callers that arrive
+    while it is still running attach to the same Call and replay its chunks
+    from the beginning, so a streamed generation fans out to all of them.
+
+    Every caller must consume or close ``call.iter_chunks()``. When the last
+    one closes it before the upstream call has finished, the upstream chunks
+    iterator is closed as well, which ends the request and releases whatever
+    it holds.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fetch):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+                call.on_leave = lambda: self._leave(key, call)
+            call.waiters += 1
+        if leader:
+            threading.Thread(target=self._run, args=(key, call, fetch), daemon=True).start()
+        try:
+            call.wait_started()
+        except Exception:
+            self._leave(key, call)
+            raise
+        return call
+
+    def _leave(self, key, call):
+        with self.lock:
+            call.waiters -= 1
+            if call.waiters or call.done:
+                return
+            # Nobody is reading any more: stop the upstream call, and let the
+            # next identical request start a fresh one.
+            call.cancelled = True
+            if self.calls.get(key) is call:
+                del self.calls[key]
+
+    def _run(self, key, call, fetch):
+        chunks = None
+        try:
+            status, content_type, chunks = fetch()
+            with call.cond:
+                call.status, call.content_type, call.started = status, content_type, True
+                call.cond.notify_all()
+            for chunk in chunks:
+                # Checked per chunk: closing chunks from another thread while
+                # this one is reading it is not allowed.
+                if call.cancelled:
+                    break
+                with call.cond:
+                    call.chunks.append(chunk)
+                    call.cond.notify_all()
+        except Exception as e:
+            call.error = e
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            with call.cond:
+                call.started = call.done = True
+                call.cond.notify_all()